@@ -0,0 +1,232 @@
+# Python 3.10.6
+# =========================================================
+# Running statistics, updated every cycle in constant memory
+# =========================================================
+
+import numpy as np
+from moments import exact_moment
+from error_analysis import BlockingAccumulator
+
+# number of values buffered before they are added to the statistics
+BUFFER_SIZE = 65536
+
+
+def add_to_bincount(histogram: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Add the non-negative integer `values` to the int64 `histogram`,
+    growing it if any value is beyond its end. Returns the histogram,
+    which is a new array if it had to grow.
+    """
+    counts = np.bincount(values)
+    if len(counts) > len(histogram):
+        # at least double, so growing is rare
+        size = max(len(counts), 2 * len(histogram))
+        histogram = np.concatenate(
+            [histogram, np.zeros(size - len(histogram), dtype=np.int64)])
+    histogram[:len(counts)] += counts
+    return histogram
+
+
+def add_bincounts(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    The sum of two histograms of possibly different lengths.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    total = a.copy()
+    total[:len(b)] += b
+    return total
+
+
+class Accumulator:
+    """
+    Base class for statistics of integer values seen one at a time, e.g.
+    once per cycle. Values are buffered, and added a whole buffer at a time
+    by `add_values`, which each accumulator overrides, since numpy is much
+    faster on arrays than on single values.
+    """
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.buffer = np.empty(BUFFER_SIZE, dtype=np.int64)
+        self.buffer_position: int = 0
+
+    def __getstate__(self) -> dict:
+        # the buffer is flushed rather than saved, to keep pickles small
+        self.flush()
+        state = self.__dict__.copy()
+        del state["buffer"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.buffer = np.empty(BUFFER_SIZE, dtype=np.int64)
+
+    def add(self, value: int) -> None:
+        """
+        Add a single value.
+        """
+        self.buffer[self.buffer_position] = value
+        self.buffer_position += 1
+        if self.buffer_position == BUFFER_SIZE:
+            self.flush()
+
+    def add_array(self, values) -> None:
+        """
+        Add a whole array of values, e.g. a chunk of a saved series.
+        """
+        self.flush()
+        values = np.asarray(values, dtype=np.int64)
+        if len(values) > 0:
+            self.add_values(values)
+
+    def add_values(self, values: np.ndarray) -> None:
+        """
+        Add a non-empty int64 array of values to the statistics.
+        """
+        raise Exception("add_values must be overridden")
+
+    def flush(self) -> None:
+        """
+        Add any buffered values to the statistics.
+        """
+        if self.buffer_position > 0:
+            values = self.buffer[:self.buffer_position].copy()
+            self.buffer_position = 0
+            self.add_values(values)
+
+    def get_count(self) -> int:
+        self.flush()
+        return self.count
+
+
+class HeightAccumulator(Accumulator):
+    """
+    The mean, variance and skewness of a sequence of pile heights, along with
+    a histogram of every height seen, updated one height at a time.
+    Moments are combined a buffer at a time with the pairwise formulas of
+    Chan et al, a batched form of Welford's method, which stays accurate
+    over billions of values. Accumulators from separate runs can be merged.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.mean: float = 0.0
+        # sums of the second and third powers of deviations from the mean
+        self.m2: float = 0.0
+        self.m3: float = 0.0
+        self.histogram = np.zeros(0, dtype=np.int64)
+        # for the error on the mean, since heights are strongly correlated
+        self.blocking = BlockingAccumulator()
+
+    def add_values(self, values: np.ndarray) -> None:
+        mean = np.mean(values)
+        deviations = values - mean
+        self.combine(len(values), mean, np.sum(deviations**2),
+                     np.sum(deviations**3))
+        self.histogram = add_to_bincount(self.histogram, values)
+        self.blocking.add_array(values)
+
+    def combine(self, count: int, mean: float, m2: float, m3: float) -> None:
+        """
+        Combine the moments of another set of heights with these.
+        """
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.m3 += m3 + delta**3 * self.count * count * (self.count - count) / total**2 \
+            + 3 * delta * (self.count * m2 - count * self.m2) / total
+        self.m2 += m2 + delta**2 * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+
+    def merge(self, other: "HeightAccumulator") -> None:
+        """
+        Add all of the heights seen by `other`, e.g. from another worker.
+        """
+        self.flush()
+        other.flush()
+        self.combine(other.count, other.mean, other.m2, other.m3)
+        self.histogram = add_bincounts(self.histogram, other.histogram)
+        self.blocking.merge(other.blocking)
+
+    def get_mean(self) -> float:
+        self.flush()
+        return self.mean
+
+    def get_mean_error(self) -> float:
+        """
+        The error on the mean, by blocking, which accounts for the
+        correlation between successive heights.
+        """
+        self.flush()
+        return self.blocking.get_error()
+
+    def get_variance(self) -> float:
+        """
+        The population variance, as from np.var.
+        """
+        self.flush()
+        return self.m2 / self.count
+
+    def get_std(self) -> float:
+        """
+        The population standard deviation, as from np.std.
+        """
+        return np.sqrt(self.get_variance())
+
+    def get_skewness(self) -> float:
+        """
+        The skewness, as from scipy.stats.skew.
+        """
+        self.flush()
+        return np.sqrt(self.count) * self.m3 / self.m2**1.5
+
+    def get_histogram(self) -> np.ndarray:
+        """
+        The number of times each pile height was seen, indexed by height.
+        """
+        self.flush()
+        return self.histogram
+
+
+class AvalancheHistogram(Accumulator):
+    """
+    The number of avalanches of each size, in a growable int64 bincount,
+    updated one avalanche at a time. Its memory use depends only on the
+    largest avalanche, not the number of avalanches, and histograms from
+    separate repetitions or workers can be merged.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.histogram = np.zeros(0, dtype=np.int64)
+
+    def add_values(self, values: np.ndarray) -> None:
+        self.count += len(values)
+        self.histogram = add_to_bincount(self.histogram, values)
+
+    def merge(self, other: "AvalancheHistogram") -> None:
+        """
+        Add all of the avalanches seen by `other`, e.g. from another worker.
+        """
+        self.flush()
+        other.flush()
+        self.count += other.count
+        self.histogram = add_bincounts(self.histogram, other.histogram)
+
+    def get_histogram(self) -> np.ndarray:
+        """
+        The number of avalanches of each size, indexed by size.
+        """
+        self.flush()
+        return self.histogram
+
+    def get_moment(self, order: int) -> float:
+        """
+        The `order`th moment of the avalanche size, <s^order>, exactly.
+        Use `moments.moments` for many orders at once, far faster.
+        """
+        self.flush()
+        return float(exact_moment(self.histogram, order))
@@ -5,8 +5,8 @@
 
 import matplotlib.pyplot as plt
 from utils import figures_folder
-from generate_avalanches import get_avalanches_data
-from logbin import logbin
+from generate_avalanches import get_avalanche_histograms
+from logbin import logbin_batch
 
 # =========================================================
 # parameters
@@ -19,20 +19,21 @@ D = 2.19
 # =========================================================
 # get data
 # =========================================================
-lengths, avalanches_list = get_avalanches_data()
+lengths, histograms = get_avalanche_histograms()
 
 # since finite scaling ansatz only valid for L >> 1
 # ignoring L = 4 & 8
 lengths = lengths[2:]
-avalanches_list = avalanches_list[2:]
+histograms = histograms[2:]
 
 # =========================================================
 # logbin data
 # =========================================================
 log_binned_avalanches_x = []
 log_binned_avalanches_y = []
-for i in avalanches_list:
-    x_vals, y_vals = logbin(i, scale=scale, zeros=False)
+# all lengths at once, sharing the same bin edges
+for x_vals, y_vals in logbin_batch([histogram.get_histogram() for histogram in histograms],
+                                   scale=scale, zeros=False):
     log_binned_avalanches_x.append(x_vals)
     log_binned_avalanches_y.append(y_vals)
 
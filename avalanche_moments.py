@@ -3,11 +3,15 @@
 # Generate the avalanche moments plot
 # =========================================================
 
-from generate_avalanches import get_avalanches_data
+from generate_avalanches import get_avalanche_histograms, get_avalanches_data
+from error_analysis import BlockingAccumulator, block_means, block_bootstrap
+from dataset import CHUNK_SIZE
 import matplotlib.pyplot as plt
 from utils import figures_folder
 from scipy.optimize import curve_fit
 import numpy as np
+from moments import moments
+from scaling_functions import power_law, power_law_jacobian, linear, linear_jacobian
 
 # =========================================================
 # parameters
@@ -19,47 +23,29 @@ moments_to_plot = [1, 2, 3, 4]
 # =========================================================
 # get data
 # =========================================================
-lengths, avalanches_list = get_avalanches_data()
+lengths, histograms = get_avalanche_histograms()
 
 # since finite scaling ansatz only valid for L >> 1
 # ignoring L = 4 & 8
 lengths = lengths[2:]
-avalanches_list = avalanches_list[2:]
+histograms = histograms[2:]
 
 # =========================================================
 # calculate moments
 # =========================================================
-
-
-def calculate_moment(data, order):
-    scaled_data = [i**order for i in data]
-    return sum(scaled_data) / len(data)
-
-
-# calculate the moments
-moments_values = []
-for m in moments_to_plot:
-    y_vals = []
-    for l in range(len(lengths)):
-        y_vals.append(calculate_moment(avalanches_list[l], m))
-    moments_values.append(y_vals)
+# calculate every moment of each length at once, from its histogram
+moments_values = [[] for _ in moments_to_plot]
+moments_errors = [[] for _ in moments_to_plot]
+for histogram in histograms:
+    values, errors = moments(histogram.get_histogram(), moments_to_plot)
+    for m in range(len(moments_to_plot)):
+        moments_values[m].append(values[m])
+        moments_errors[m].append(errors[m])
+print("Moment errors:", moments_errors)
 
 # =========================================================
 # fitting the moments
 # =========================================================
-
-
-def power_law_func(L, a0, a1):
-    try:
-        L[0]
-        results = []
-        for L_i in L:
-            results.append(a0 * L_i ** a1)
-        return results
-    except:
-        return a0 * L ** a1
-
-
 fit_data = []
 a1_errors = []
 initial_guesses = [
@@ -69,8 +55,8 @@ initial_guesses = [
     [0.01, 8],  # 4
 ]
 for m in range(len(moments_to_plot)):
-    popt, pcov = curve_fit(power_law_func, lengths,
-                           moments_values[m], p0=initial_guesses[all_moments.index(moments_to_plot[m])], method='dogbox', max_nfev=100000)
+    popt, pcov = curve_fit(power_law, lengths, moments_values[m], p0=initial_guesses[all_moments.index(moments_to_plot[m])],
+                           jac=power_law_jacobian, method='dogbox', max_nfev=100000)
     fit_data.append(popt)
     a1_errors.append(np.sqrt(pcov[1][1]))
 print(a1_errors)
@@ -82,27 +68,40 @@ print(a1_errors)
 y_vals = [i[1] for i in fit_data]
 x_vals = moments_to_plot
 
-
-def linear_func(k, a, b):
-    try:
-        k[0]
-        results = []
-        for k_i in k:
-            results.append(a + b*k_i)
-        return results
-    except:
-        return a + b*k
-
-
 # fit a straight line to the data
-popt, pcov = curve_fit(linear_func, x_vals, y_vals)
+popt, pcov = curve_fit(linear, x_vals, y_vals, jac=linear_jacobian)
 print("Fit: %.2f + %.2f * k" % (popt[0], popt[1]))
 D = popt[1]
-D_err = np.sqrt(pcov[1, 1])
 Ts = 1 - (popt[0]/popt[1])
-# propagation by quadrature
-Ts_err = Ts * np.sqrt((np.sqrt(pcov[0, 0])/popt[0])
-                      ** 2 + (np.sqrt(pcov[1, 1])/popt[1])**2)
+
+
+def bootstrap_fit(resampled):
+    """
+    Refit every moment, then the line through their exponents, to one block
+    bootstrap resample of the moments, returning (D, Ts).
+    """
+    exponents = []
+    for m in range(len(moments_to_plot)):
+        values = [resampled[i][moments_to_plot[m] - 1] for i in range(len(lengths))]
+        exponents.append(curve_fit(power_law, lengths, values, p0=fit_data[m],
+                                   jac=power_law_jacobian, method='dogbox',
+                                   max_nfev=100000)[0][1])
+    line = curve_fit(linear, x_vals, exponents, p0=popt, jac=linear_jacobian)[0]
+    return [line[1], 1 - line[0] / line[1]]
+
+
+# errors on D and Ts by block bootstrap of the avalanche size series, with
+# blocks long enough for successive avalanches to be correlated within them
+_, avalanches_list = get_avalanches_data()
+avalanches_list = avalanches_list[2:]
+block_means_list = []
+for series in avalanches_list:
+    blocking = BlockingAccumulator()
+    for start in range(0, len(series), CHUNK_SIZE):
+        blocking.add_array(series[start:start + CHUNK_SIZE])
+    block_means_list.append(block_means(series, blocking.get_block_length(),
+                                        max(moments_to_plot)))
+D_err, Ts_err = np.std(block_bootstrap(bootstrap_fit, block_means_list), axis=0)
 print("D: %.3f" % D)
 print("D error: %.3f" % D_err)
 print("Ts: %.3f" % Ts)
@@ -120,7 +119,7 @@ ax1 = fig.add_subplot(121)
 for m in range(len(moments_to_plot)):
     ax1.scatter(lengths, moments_values[m], c="C%s" % (
         m + color_shift), label="k = %s" % (moments_to_plot[m]), marker='+', s=50)  # type: ignore
-    ax1.plot(lengths, power_law_func(
+    ax1.plot(lengths, power_law(
         lengths, *fit_data[m]), color="C%s" % (m + color_shift), alpha=0.3)
 ax1.set_xlabel("System Size, $L$")
 ax1.set_ylabel(r"$\langle \, s^k \, \rangle$")
@@ -132,7 +131,7 @@ ax1.set_title("(A)")
 ax2 = fig.add_subplot(122)
 ax2.scatter(x_vals, y_vals, c='k', label='Values',
             marker='+', s=50)  # type: ignore
-ax2.plot(x_vals, linear_func(
+ax2.plot(x_vals, linear(
     x_vals, popt[0], popt[1]), c='grey', zorder=-1, label='Fit')
 ax2.set_xlabel("$k$")
 ax2.set_ylabel(r"$D \, (1 + k - \tau_s)$")
@@ -0,0 +1,203 @@
+# Python 3.10.6
+# =========================================================
+# Benchmark cycle throughput, generator memory and worker scaling
+# =========================================================
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from model import Model
+from steady_states import steady_state_model
+from sweep import run_sweep
+from utils import data_folder
+
+# the cycle variants, as method names of Model
+variants = ["cycle", "cycle_with_relax_count", "cycle_with_transition_counts"]
+
+# the results compared against the baseline, everything within "memory_kb"
+compared_keys = ("cycles_per_second", "relaxations_per_second", "memory_kb", "efficiency")
+
+
+def benchmark_cycles(length: int, min_seconds: float = 1.0, seed: int = 0) -> dict:
+    """
+    Cycles and relaxations per second of each cycle variant, for a steady
+    state system of the given length. Every variant starts from the same
+    state and random stream, so all run exactly the same avalanches, and
+    the relaxations counted by `cycle` apply to each of them.
+    """
+    state = steady_state_model(length, seed=seed).get_state()
+    # enough cycles to take at least min_seconds, found with plain cycles
+    model = Model.from_state(state)
+    num_cycles, relaxations = 0, 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        relaxations += model.cycle()
+        num_cycles += 1
+
+    results = {}
+    for variant in variants:
+        model = Model.from_state(state)
+        step = getattr(model, variant)
+        start = time.perf_counter()
+        for _ in range(num_cycles):
+            step()
+        seconds = time.perf_counter() - start
+        results[variant] = {
+            "cycles": num_cycles,
+            "seconds": seconds,
+            "cycles_per_second": num_cycles / seconds,
+            "relaxations_per_second": relaxations / seconds,
+        }
+    return results
+
+
+# run in a fresh interpreter, so its peak memory is the generator's alone
+rss_code = """
+import resource, sys
+sys.path.insert(0, %r)
+import numpy as np
+from dataset import series_path, create_series
+from generate_heights import heights_task, statistics_task
+length, num_cycles, kind = %i, %i, %r
+seed = np.random.SeedSequence(0)
+if kind == "heights":
+    create_series(series_path("heights", length), np.uint16, num_cycles)
+    heights_task(length, 0, seed, num_cycles, 0.5)
+else:
+    statistics_task(length, 0, seed, num_cycles, 0.5)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def benchmark_memory(length: int, sizes: list[int]) -> dict:
+    """
+    Peak resident memory, in kB, of generating each number of steady state
+    heights in `sizes`, both as a heights series and as statistics only.
+    Each runs in a temporary folder, so no saved data is touched.
+    """
+    repo = os.path.dirname(os.path.abspath(__file__))
+    results: dict = {"heights": {}, "statistics": {}}
+    with tempfile.TemporaryDirectory() as folder:
+        for kind in results:
+            for size in sizes:
+                output = subprocess.run(
+                    [sys.executable, "-c", rss_code % (repo, length, size, kind)],
+                    cwd=folder, capture_output=True, text=True, check=True).stdout
+                results[kind][str(size)] = int(output.split()[-1])
+    return results
+
+
+def scaling_task(length: int, repetition: int, seed, num_cycles: int) -> int:
+    """
+    A fixed amount of work for the worker scaling benchmark.
+    """
+    model = Model(length, seed=seed)
+    for _ in range(num_cycles):
+        model.cycle()
+    return model.get_pile_height()
+
+
+def benchmark_scaling(worker_counts: list[int], tasks: int = 16, length: int = 64,
+                      num_cycles: int = 20000) -> dict:
+    """
+    Seconds to run `tasks` identical sweep tasks with each number of workers,
+    and the parallel efficiency, t_1 / (workers * t_workers).
+    """
+    results = {}
+    for workers in worker_counts:
+        start = time.perf_counter()
+        run_sweep(scaling_task, [length], repetitions=tasks, seed=0, workers=workers,
+                  args=(num_cycles,))
+        results[str(workers)] = {"seconds": time.perf_counter() - start}
+    single = results[str(worker_counts[0])]["seconds"] * worker_counts[0]
+    for workers in worker_counts:
+        results[str(workers)]["efficiency"] = \
+            single / (workers * results[str(workers)]["seconds"])
+    return results
+
+
+def compare(results: dict, baseline: dict, compared: bool = False) -> dict:
+    """
+    The ratio of every measured rate, memory and efficiency in `results` to
+    the same number in `baseline`, for those in both, e.g. 1.2 for
+    cycles_per_second is 20% faster. Counts and timings which depend on the
+    run, e.g. cycles or seconds, are left out.
+    """
+    ratios = {}
+    for key, value in results.items():
+        if key not in baseline:
+            continue
+        is_compared = compared or key in compared_keys
+        if isinstance(value, dict) and isinstance(baseline[key], dict):
+            nested = compare(value, baseline[key], is_compared)
+            if nested:
+                ratios[key] = nested
+        elif is_compared and isinstance(value, (int, float)) \
+                and isinstance(baseline[key], (int, float)) and baseline[key] != 0:
+            ratios[key] = value / baseline[key]
+    return ratios
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark cycle throughput, generator memory and worker scaling")
+    parser.add_argument("--max-length", type=int, default=512,
+                        help="largest system length to time, from 4 in powers of 2. "
+                        "the first run at each length generates and stores its steady "
+                        "state, taking ~12x longer per doubling of L: ~1 min at 512, "
+                        "but hours at 2048 and over a day at 4096")
+    parser.add_argument("--seconds", type=float, default=1.0,
+                        help="minimum seconds to time each variant for")
+    parser.add_argument("--memory-sizes", type=int, nargs="*",
+                        default=[10000, 100000, 1000000],
+                        help="numbers of heights to measure generator memory for")
+    parser.add_argument("--output", default=data_folder + "benchmarks.json")
+    parser.add_argument("--baseline", default=data_folder + "benchmarks_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="also store these results as the new baseline")
+    options = parser.parse_args()
+
+    lengths = []
+    length = 4
+    while length <= options.max_length:
+        lengths.append(length)
+        length *= 2
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, 16, cores} & set(range(1, cores + 1)))
+
+    results: dict = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cores": cores},
+        "cycles": {},
+    }
+    for length in lengths:
+        results["cycles"][str(length)] = benchmark_cycles(length, options.seconds)
+        print("L = %i:" % length, ", ".join(
+            "%s %.0f cycles/s, %.0f relaxations/s" % (
+                variant, value["cycles_per_second"], value["relaxations_per_second"])
+            for variant, value in results["cycles"][str(length)].items()))
+    results["memory_kb"] = benchmark_memory(64, options.memory_sizes)
+    print("Peak memory (kB):", results["memory_kb"])
+    results["scaling"] = benchmark_scaling(worker_counts)
+    print("Worker scaling:", results["scaling"])
+
+    # compare against the baseline, if there is one
+    try:
+        with open(options.baseline, "r") as f:
+            results["baseline_ratios"] = compare(results, json.load(f))
+        print("Ratios to baseline:", json.dumps(results["baseline_ratios"].get("cycles"), indent=1))
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(options.output) or ".", exist_ok=True)
+    with open(options.output, "w") as f:
+        json.dump(results, f, indent=1)
+    if options.save_baseline:
+        baseline = {key: value for key, value in results.items() if key != "baseline_ratios"}
+        with open(options.baseline, "w") as f:
+            json.dump(baseline, f, indent=1)
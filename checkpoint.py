@@ -0,0 +1,55 @@
+# Python 3.10.6
+# =========================================================
+# Checkpoints, so long runs can be resumed after a crash
+# =========================================================
+
+import os
+import pickle
+
+
+def checkpoint_path(path: str, repetition: int = 0) -> str:
+    """
+    Path of the checkpoint for one repetition of the output at `path`.
+    """
+    return os.path.splitext(path)[0] + "_r%i.checkpoint" % repetition
+
+
+def save_checkpoint(path: str, state: dict) -> None:
+    """
+    Save `state` to the checkpoint at `path`.
+    The file is replaced in one step, so a crash while saving
+    leaves the previous checkpoint intact.
+    """
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as f:
+        pickle.dump(state, f)
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(path: str) -> dict | None:
+    """
+    Load the checkpoint at `path`, or None if there isn't one.
+    """
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def remove_checkpoint(path: str) -> None:
+    """
+    Remove the checkpoint at `path` once its run is complete.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def remove_checkpoints(path: str, repetitions: int) -> None:
+    """
+    Remove the checkpoints of every repetition of the output at `path`.
+    Tasks keep their final checkpoint, so a crash elsewhere in a sweep
+    loses no finished work. Call this only once the output has been saved.
+    """
+    for repetition in range(repetitions):
+        remove_checkpoint(checkpoint_path(path, repetition))
@@ -0,0 +1,112 @@
+# Python 3.10.6
+# =========================================================
+# Typed, memory-mappable files for long simulation series
+# =========================================================
+
+import json
+import os
+import numpy as np
+from utils import data_folder
+
+# number of values simulated before each write to disk
+CHUNK_SIZE = 65536
+
+
+def series_path(name: str, length: int) -> str:
+    """
+    Path of the series file called `name` for a system of the given length.
+    """
+    return data_folder + "%s_L%i.npy" % (name, length)
+
+
+def metadata_path(path: str) -> str:
+    """
+    Path of the metadata file belonging to the series file at `path`.
+    """
+    return os.path.splitext(path)[0] + ".json"
+
+
+def seed_metadata(seed) -> dict:
+    """
+    A JSON friendly description of a `np.random.SeedSequence`,
+    from which the same stream can be rebuilt.
+    """
+    return {"entropy": seed.entropy, "spawn_key": list(seed.spawn_key)}
+
+
+def create_series(path: str, dtype, size: int) -> np.memmap:
+    """
+    Create a new series file of `size` zeros, and return it
+    as a writable memory map.
+    If a file of the right type and size already exists, e.g. from an
+    interrupted run, it is kept, so checkpointed tasks can resume into it.
+    """
+    try:
+        series = open_series(path, "r+")
+        if series.dtype == dtype and series.shape == (size,):
+            return series
+    except (FileNotFoundError, ValueError):
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(size,))
+
+
+def open_series(path: str, mode: str = "r") -> np.memmap:
+    """
+    Open a series file as a memory map, read only by default.
+    Use `mode="r+"` to write into part of it, e.g. from a worker.
+    """
+    return np.load(path, mmap_mode=mode)
+
+
+def write_metadata(path: str, metadata: dict) -> None:
+    """
+    Save the metadata of the series file at `path`.
+    This is written last, so also marks the series as complete.
+    """
+    with open(metadata_path(path), "w") as f:
+        json.dump(metadata, f, indent=1)
+
+
+def load_metadata(path: str) -> dict:
+    """
+    Load the metadata of the series file at `path`.
+    Raises an exception if the series was never completed.
+    """
+    with open(metadata_path(path), "r") as f:
+        return json.load(f)
+
+
+def load_complete_series(paths: list[str]) -> list[np.memmap]:
+    """
+    Open every series in `paths`, read only.
+    Raises an exception if any is missing or incomplete.
+    """
+    for path in paths:
+        load_metadata(path)
+    return [open_series(path) for path in paths]
+
+
+def stream_into_series(path: str, offset: int, num_values: int, step,
+                       start: int = 0, on_chunk=None) -> None:
+    """
+    Fill `num_values` entries of the series at `path`, starting at `offset`,
+    with the values returned by successive calls of `step()`.
+    Values are collected in chunks of `CHUNK_SIZE`, so memory use is bounded.
+    To resume, `start` skips entries which have already been written.
+    After each chunk is flushed to disk, `on_chunk(written)` is called
+    with the number of entries written so far, e.g. to save a checkpoint.
+    """
+    series = open_series(path, "r+")
+    chunk = np.empty(CHUNK_SIZE, dtype=series.dtype)
+    written = start
+    while written < num_values:
+        n = min(CHUNK_SIZE, num_values - written)
+        for j in range(n):
+            chunk[j] = step()
+        series[offset + written:offset + written + n] = chunk[:n]
+        series.flush()
+        written += n
+        if on_chunk is not None:
+            on_chunk(written)
+    del series
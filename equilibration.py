@@ -0,0 +1,47 @@
+# Python 3.10.6
+# =========================================================
+# Detect steady state, and how correlated steady state samples are
+# =========================================================
+
+import numpy as np
+from time_series import integrated_autocorrelation_time
+
+
+def equilibrate(model, window: int | None = None, tolerance: float = 0.5,
+                max_cycles: int | None = None) -> int:
+    """
+    Cycle `model` until it is in steady state and return the number of
+    cycles run. The model must first leave the transient state, then the
+    mean pile height of consecutive windows of `window` cycles, default
+    L^2 / 16, must differ by no more than `tolerance` standard deviations.
+    Raises an exception if this takes more than `max_cycles`.
+    """
+    if window is None:
+        window = max(model.length**2 // 16, 64)
+    cycles = 0
+    # a grain leaving the end marks the end of the transient state
+    while model.get_is_transient():
+        model.cycle()
+        cycles += 1
+    previous_mean, previous_std = None, None
+    while True:
+        heights: list[int] = []
+        for _ in range(window):
+            model.cycle()
+            heights.append(model.get_pile_height())
+        cycles += window
+        mean, std = np.mean(heights), np.std(heights)
+        # check the pile height is no longer drifting
+        if previous_mean is not None:
+            if abs(mean - previous_mean) <= tolerance * np.sqrt((std**2 + previous_std**2) / 2):
+                return cycles
+        previous_mean, previous_std = mean, std
+        if max_cycles is not None and cycles >= max_cycles:
+            raise Exception("Not in steady state after %i cycles" % cycles)
+
+
+def thinning_interval(series, c: float = 5.0) -> int:
+    """
+    The number of cycles between roughly independent samples of `series`.
+    """
+    return max(1, int(np.ceil(integrated_autocorrelation_time(series, c))))
@@ -0,0 +1,209 @@
+# Python 3.10.6
+# =========================================================
+# Errors on statistics of correlated time series
+# =========================================================
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import numpy as np
+from model import spawn_seeds
+from sweep import get_context
+
+
+class BlockingAccumulator:
+    """
+    The Flyvbjerg-Petersen blocking analysis of a correlated series, updated
+    a chunk at a time. At each level, neighbouring values of the level below
+    are averaged in pairs, and the variance of the resulting block means
+    gives an estimate of the error on the mean. Once the blocks are longer
+    than the correlation time these estimates stop growing, and that plateau
+    is the honest error, rather than std / sqrt(n) of the raw series.
+    Memory use only grows with the log of the length of the series.
+    """
+
+    def __init__(self) -> None:
+        # values are taken relative to the first, to keep sums accurate
+        self.shift: float | None = None
+        self.counts: list[int] = []
+        self.sums: list[float] = []
+        self.squares: list[float] = []
+        # the unpaired last value at each level, waiting for the next chunk
+        self.leftovers: list[float | None] = []
+
+    def add_array(self, values) -> None:
+        """
+        Add the next chunk of the series.
+        """
+        x = np.asarray(values, dtype=float)
+        if len(x) == 0:
+            return
+        if self.shift is None:
+            self.shift = float(x[0])
+        x = x - self.shift
+        level = 0
+        while len(x) > 0:
+            if level == len(self.counts):
+                self.counts.append(0)
+                self.sums.append(0.0)
+                self.squares.append(0.0)
+                self.leftovers.append(None)
+            self.counts[level] += len(x)
+            self.sums[level] += float(np.sum(x))
+            self.squares[level] += float(np.sum(x * x))
+            # pair up with the previous chunk's leftover, and keep any new one
+            if self.leftovers[level] is not None:
+                x = np.concatenate([[self.leftovers[level]], x])
+                self.leftovers[level] = None
+            if len(x) % 2 == 1:
+                self.leftovers[level] = x[-1]
+                x = x[:-1]
+            x = (x[0::2] + x[1::2]) / 2
+            level += 1
+
+    def merge(self, other: "BlockingAccumulator") -> None:
+        """
+        Add the blocks of `other`, a separate run, to these.
+        The pairs that would span the two runs are left out.
+        """
+        if other.shift is None:
+            return
+        if self.shift is None:
+            self.shift = other.shift
+        difference = other.shift - self.shift
+        for level in range(len(other.counts)):
+            if level == len(self.counts):
+                self.counts.append(0)
+                self.sums.append(0.0)
+                self.squares.append(0.0)
+                self.leftovers.append(None)
+            n, total = other.counts[level], other.sums[level]
+            self.counts[level] += n
+            self.sums[level] += total + n * difference
+            self.squares[level] += other.squares[level] + 2 * difference * total \
+                + n * difference**2
+
+    def get_errors(self) -> np.ndarray:
+        """
+        The estimated error on the mean at every level with at least two
+        blocks, starting from the raw series at level 0.
+        """
+        errors = []
+        for n, total, square in zip(self.counts, self.sums, self.squares):
+            if n < 2:
+                break
+            variance = max(square / n - (total / n)**2, 0)
+            errors.append(np.sqrt(variance / (n - 1)))
+        return np.array(errors)
+
+    def get_optimal_level(self) -> int | None:
+        """
+        The first level whose blocks are long enough, by the criterion of
+        Lee et al, B^3 > 2 n (error_B / error_0)^4 for blocks of length B.
+        None if the series is too short for any level to qualify.
+        """
+        errors = self.get_errors()
+        if len(errors) == 0 or errors[0] == 0:
+            return 0 if len(errors) > 0 else None
+        for level in range(len(errors)):
+            if 2**(3 * level) > 2 * self.counts[0] * (errors[level] / errors[0])**4:
+                return level
+        return None
+
+    def get_block_length(self, min_blocks: int = 32) -> int:
+        """
+        The length of the blocks at the optimal level, e.g. for a block
+        bootstrap. If no level qualifies, the longest blocks which still
+        leave `min_blocks` blocks are used instead.
+        """
+        level = self.get_optimal_level()
+        if level is None:
+            level = 0
+            while level + 1 < len(self.counts) and self.counts[level + 1] >= min_blocks:
+                level += 1
+        return 2**level
+
+    def get_error(self) -> float:
+        """
+        The error on the mean of the series, at the optimal level.
+        If no level qualifies the largest estimate is given, which is
+        then likely still an underestimate.
+        """
+        errors = self.get_errors()
+        level = self.get_optimal_level()
+        if level is None:
+            return float(np.max(errors))
+        return float(errors[level])
+
+
+def blocking_error(series) -> float:
+    """
+    The error on the mean of a correlated `series`, by blocking.
+    """
+    accumulator = BlockingAccumulator()
+    accumulator.add_array(series)
+    return accumulator.get_error()
+
+
+def block_means(series, block_length: int, powers: int = 1,
+                chunk_size: int = 2**20) -> np.ndarray:
+    """
+    The means of x, x^2, ..., x^powers over each non-overlapping block of
+    `block_length` values of `series`, as a (blocks, powers) array.
+    The series is read a chunk at a time, so it can be memory mapped.
+    Any incomplete block at the end is left out.
+    """
+    num_blocks = len(series) // block_length
+    # whole blocks per chunk, so no block is split between chunks
+    blocks_per_chunk = max(1, chunk_size // block_length)
+    means = np.empty((num_blocks, powers))
+    for start in range(0, num_blocks, blocks_per_chunk):
+        stop = min(start + blocks_per_chunk, num_blocks)
+        chunk = np.asarray(series[start * block_length:stop * block_length], dtype=float)
+        chunk = chunk.reshape(stop - start, block_length)
+        for power in range(powers):
+            means[start:stop, power] = np.mean(chunk**(power + 1), axis=1)
+    return means
+
+
+def bootstrap_task(fit, block_means_list: list[np.ndarray], resamples: int, seed) -> np.ndarray:
+    """
+    Run `fit` on `resamples` block bootstrap resamples, in one process.
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for _ in range(resamples):
+        resampled = []
+        for means in block_means_list:
+            chosen = rng.integers(0, len(means), len(means))
+            resampled.append(np.mean(means[chosen], axis=0))
+        results.append(np.asarray(fit(resampled), dtype=float))
+    return np.array(results)
+
+
+def block_bootstrap(fit, block_means_list: list[np.ndarray], resamples: int = 1000,
+                    seed=None, workers: int | None = None) -> np.ndarray:
+    """
+    Block bootstrap of a fit to statistics of several correlated series,
+    e.g. one pile height series for each length.
+    `block_means_list[i]` is the output of `block_means` for series i.
+    For each resample, the blocks of every series are drawn with replacement,
+    giving the resampled means of x, x^2, ... for each series, and
+    `fit(resampled)` is called with the list of these, returning the fitted
+    parameters. Returns a (resamples, parameters) array, whose standard
+    deviation down each column is the error on that parameter.
+    Resamples are spread over `workers` processes, default all cores, so
+    `fit` must be a module level function, as for `sweep.run_sweep`.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, resamples)
+    seeds = spawn_seeds(seed, workers)
+    # split the resamples as evenly as possible
+    shares = [resamples // workers + (1 if i < resamples % workers else 0)
+              for i in range(workers)]
+    if workers == 1:
+        return bootstrap_task(fit, block_means_list, resamples, seeds[0])
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context()) as pool:
+        futures = [pool.submit(bootstrap_task, fit, block_means_list, shares[i], seeds[i])
+                   for i in range(workers)]
+        return np.concatenate([future.result() for future in futures])
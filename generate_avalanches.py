@@ -3,47 +3,174 @@
 # Generate all of the avalanche data
 # =========================================================
 
-from model import Model
 import pickle
+from model import Model
+from steady_states import steady_state_model, configuration_hash
+import numpy as np
+from accumulators import AvalancheHistogram
 from utils import data_folder
+from dataset import CHUNK_SIZE, series_path, create_series, stream_into_series, \
+    write_metadata, load_complete_series, seed_metadata
+from checkpoint import checkpoint_path, save_checkpoint, load_checkpoint, \
+    remove_checkpoints
+from sweep import run_sweep
+
+
+def avalanches_task(length: int, repetition: int, seed, num_cycles: int, p: float) -> dict:
+    """
+    Write the sizes of `num_cycles` steady state avalanches for a single
+    system of the given length into its part of the avalanches series.
+    Progress is checkpointed after every chunk, and resumed from on a rerun,
+    and the final checkpoint is kept until the whole series is saved.
+    Returns the metadata of this repetition, including the seed it was
+    first started with.
+    """
+    path = series_path('avalanches', length)
+    checkpoint = checkpoint_path(path, repetition)
+
+    def save(written: int) -> None:
+        save_checkpoint(checkpoint, {"model": model.get_state(), "written": written,
+                                     "metadata": metadata})
 
+    # resume from the last checkpoint, if there is one
+    state = load_checkpoint(checkpoint)
+    if state is None:
+        # start from a stored steady state, rather than warming up
+        model = steady_state_model(length, p, seed)
+        metadata = {"seed": seed_metadata(seed),
+                    "steady_state": configuration_hash(model.gradients, model.thresholds)}
+        written = 0
+        save(written)
+    else:
+        # the seed of this call may not be the one which made the data so far
+        model = Model.from_state(state["model"])
+        metadata = state["metadata"]
+        written = state["written"]
 
-def get_avalanches_data() -> tuple[list[int], list[list[int]]]:
+    # only then count the avalanches
+    stream_into_series(path, repetition * num_cycles, num_cycles,
+                       model.cycle_with_relax_count, written, save)
+    return metadata
+
+
+def get_avalanches_data(seed=None, workers: int | None = None) -> tuple[list[int], list[np.ndarray]]:
     """
-    Returns (lengths, avalanches_list).
-    If the data hasn't been saved, it will be generated.
+    Returns (lengths, avalanches_list), with each list of avalanche
+    sizes a read only, memory mapped uint32 array.
+    If the data hasn't been saved, it will be generated, with
+    the lengths spread over `workers` processes, default all cores.
     Generating the data may take some time.
     """
     lengths = [4, 8, 16, 32, 64, 128, 256, 512]
     num_cycles = 1000000
     repetitions = 1
-    filename = 'avalanches_list.pickle'
+    p = 0.5
+    paths = [series_path('avalanches', length) for length in lengths]
 
-    avalanches_list: list[list[int]] = []
     # if saved data, use that, else generate new data
     try:
-        # attempt to load the data file
-        with open(data_folder + filename, "rb") as f:
-            avalanches_list: list[list[int]] = pickle.load(f)
+        # attempt to load the data files
+        avalanches_list = load_complete_series(paths)
     except:
-        # generate the data
-        for length in lengths:
-            avalanches: list[int] = []
-
-            for _ in range(repetitions):
-                model = Model(length)
-                # maximum number of grains in steady state is 1/2 * L * 2L = L^2
-                for _ in range(length**2):
-                    model.cycle()
-                # only then count the avalanches
-                for _ in range(num_cycles):
-                    avalanches.append(model.cycle_with_relax_count())
-            avalanches_list.append(avalanches)
-            # log progress, since this takes a while
-            print(length, 'complete')
-
-        # saving
-        with open(data_folder + filename, "wb") as f:
-            pickle.dump(avalanches_list, f)
+        # generate the data, straight into the files
+        for path in paths:
+            create_series(path, np.uint32, repetitions * num_cycles)
+        results = run_sweep(avalanches_task, lengths, repetitions,
+                            seed=seed, workers=workers, args=(num_cycles, p))
+        for i in range(len(lengths)):
+            write_metadata(paths[i], {
+                "length": lengths[i], "p": p, "cycles": num_cycles,
+                "repetitions": results[i]})
+            remove_checkpoints(paths[i], repetitions)
+        avalanches_list = load_complete_series(paths)
 
     return (lengths, avalanches_list)
+
+
+def histogram_path(length: int, num_cycles: int) -> str:
+    """
+    Path of the saved histogram of `num_cycles` avalanches per repetition.
+    """
+    return data_folder + "avalanche_histogram_L%i_%i.pickle" % (length, num_cycles)
+
+
+def histogram_task(length: int, repetition: int, seed, num_cycles: int, p: float) -> AvalancheHistogram:
+    """
+    Count the sizes of `num_cycles` steady state avalanches for a single
+    system of the given length in a histogram, without keeping the sizes
+    themselves, so memory use doesn't grow with `num_cycles`.
+    Progress is checkpointed, and resumed from on a rerun, and the final
+    checkpoint is kept until the histogram is saved.
+    """
+    checkpoint = checkpoint_path(histogram_path(length, num_cycles), repetition)
+
+    def save(done: int) -> None:
+        save_checkpoint(checkpoint, {"model": model.get_state(),
+                                     "histogram": histogram, "done": done})
+
+    # resume from the last checkpoint, if there is one
+    state = load_checkpoint(checkpoint)
+    if state is None:
+        model = steady_state_model(length, p, seed)
+        histogram = AvalancheHistogram()
+        done = 0
+        save(done)
+    else:
+        model = Model.from_state(state["model"])
+        histogram = state["histogram"]
+        done = state["done"]
+
+    while done < num_cycles:
+        for _ in range(min(CHUNK_SIZE, num_cycles - done)):
+            histogram.add(model.cycle())
+        done = min(done + CHUNK_SIZE, num_cycles)
+        save(done)
+    return histogram
+
+
+def get_avalanche_histograms(seed=None, workers: int | None = None, num_cycles: int | None = None,
+                             repetitions: int = 1) -> tuple[list[int], list[AvalancheHistogram]]:
+    """
+    Returns (lengths, histograms), with the avalanche sizes of each
+    length counted in an `AvalancheHistogram`.
+    By default these are of the saved avalanches series, from
+    `get_avalanches_data`. Given `num_cycles`, they are instead of
+    `repetitions` separate runs of `num_cycles` avalanches per length,
+    merged, which run in constant memory, so can be far longer.
+    These are saved, and generated if they haven't been.
+    """
+    if num_cycles is None:
+        lengths, avalanches_list = get_avalanches_data(seed, workers)
+        histograms = []
+        for data in avalanches_list:
+            histogram = AvalancheHistogram()
+            # a chunk at a time, so the series is never all in memory
+            for start in range(0, len(data), CHUNK_SIZE):
+                histogram.add_array(data[start:start + CHUNK_SIZE])
+            histograms.append(histogram)
+        return (lengths, histograms)
+
+    lengths = [4, 8, 16, 32, 64, 128, 256, 512]
+    p = 0.5
+    paths = [histogram_path(length, num_cycles) for length in lengths]
+    try:
+        histograms = []
+        for path in paths:
+            with open(path, "rb") as f:
+                saved = pickle.load(f)
+            if saved["repetitions"] != repetitions:
+                raise Exception("Saved histogram has a different number of repetitions")
+            histograms.append(saved["histogram"])
+    except:
+        results = run_sweep(histogram_task, lengths, repetitions, seed=seed,
+                            workers=workers, args=(num_cycles, p))
+        histograms = []
+        for i in range(len(lengths)):
+            histogram = AvalancheHistogram()
+            for result in results[i]:
+                histogram.merge(result)
+            save_checkpoint(paths[i], {"repetitions": repetitions,
+                                       "histogram": histogram})
+            remove_checkpoints(paths[i], repetitions)
+            histograms.append(histogram)
+    return (lengths, histograms)
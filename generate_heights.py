@@ -4,44 +4,183 @@
 # =========================================================
 
 import pickle
+import numpy as np
 from model import Model
+from accumulators import HeightAccumulator
 from utils import data_folder
+from steady_states import steady_state_model, configuration_hash
+from dataset import CHUNK_SIZE, series_path, create_series, stream_into_series, \
+    write_metadata, load_metadata, load_complete_series, seed_metadata
+from checkpoint import checkpoint_path, save_checkpoint, load_checkpoint, \
+    remove_checkpoints
+from sweep import run_sweep
 
 
-def get_heights_data() -> tuple[list[int], list[list[int]]]:
+def heights_task(length: int, repetition: int, seed, num_cycles: int, p: float,
+                 thin: int = 1) -> dict:
     """
-    Returns (lengths, height_sequence_list)
-    If the data hasn't already been saved, it will be generated. 
+    Write the pile height after every `thin`th cycle, `num_cycles` times,
+    for a single steady state system of the given length, into its part
+    of the heights series. Progress is checkpointed after every chunk, and
+    resumed from on a rerun, and the final checkpoint is kept until the
+    whole series is saved. Returns the metadata of this repetition,
+    including the seed it was first started with.
+    """
+    path = series_path('heights', length)
+    checkpoint = checkpoint_path(path, repetition)
+
+    def save(written: int) -> None:
+        save_checkpoint(checkpoint, {"model": model.get_state(), "written": written,
+                                     "metadata": metadata})
+
+    # resume from the last checkpoint, if there is one
+    state = load_checkpoint(checkpoint)
+    if state is None:
+        # start from a stored steady state, rather than warming up
+        model = steady_state_model(length, p, seed)
+        metadata = {"seed": seed_metadata(seed),
+                    "steady_state": configuration_hash(model.gradients, model.thresholds)}
+        written = 0
+        save(written)
+    else:
+        # the seed of this call may not be the one which made the data so far
+        model = Model.from_state(state["model"])
+        metadata = state["metadata"]
+        written = state["written"]
+
+    # collect the data
+    def step() -> int:
+        for _ in range(thin):
+            model.cycle()
+        return model.pile_height
+    stream_into_series(path, repetition * num_cycles, num_cycles,
+                       step, written, save)
+    return metadata
+
+
+def get_heights_data(seed=None, workers: int | None = None,
+                     thin: int = 1) -> tuple[list[int], list[np.ndarray]]:
+    """
+    Returns (lengths, height_sequence_list), with each height sequence
+    a read only, memory mapped uint16 array.
+    If the data hasn't already been saved, it will be generated, with
+    the lengths spread over `workers` processes, default all cores.
+    Only every `thin`th pile height is recorded, e.g. from
+    `equilibration.thinning_interval`, when storage matters.
     Generating the data may take some time.
     """
     lengths = [4, 8, 16, 32, 64, 128, 256, 512]
     num_cycles = 1000000
-    filename = 'pile_heights.pickle'
+    p = 0.5
+    paths = [series_path('heights', length) for length in lengths]
 
-    height_sequence_list: list[list[int]] = []
     # if saved data, use that, else generate new data
     try:
-        # attempt to load the data file
-        with open(data_folder + filename, "rb") as f:
-            height_sequence_list = pickle.load(f)
+        # attempt to load the data files
+        height_sequence_list = load_complete_series(paths)
+        for path in paths:
+            if load_metadata(path).get("thin", 1) != thin:
+                raise Exception("Saved data has a different thinning interval")
     except:
-        # generate the data
-        for length in lengths:
-            height_sequence: list[int] = []
-            model = Model(length)
-            # maximum number of grains in steady state is 1/2 * L * 2L = L^2
-            for _ in range(length**2):
-                model.cycle()
-            # collect the data
-            for _ in range(num_cycles):
-                model.cycle()
-                height_sequence.append(model.get_pile_height())
-            height_sequence_list.append(height_sequence)
-            # log progress, since this takes a while
-            print(length, 'complete')
-
-        # save the data
-        with open(data_folder + filename, "wb") as f:
-            pickle.dump(height_sequence_list, f)
+        # generate the data, one repetition per length, straight into the files
+        for path in paths:
+            create_series(path, np.uint16, num_cycles)
+        results = run_sweep(heights_task, lengths, seed=seed,
+                            workers=workers, args=(num_cycles, p, thin))
+        for i in range(len(lengths)):
+            write_metadata(paths[i], {
+                "length": lengths[i], "p": p, "cycles": num_cycles,
+                "thin": thin, "repetitions": results[i]})
+            remove_checkpoints(paths[i], 1)
+        height_sequence_list = load_complete_series(paths)
 
     return (lengths, height_sequence_list)
+
+
+def statistics_path(length: int, num_cycles: int) -> str:
+    """
+    Path of the saved statistics of `num_cycles` cycles per repetition.
+    """
+    return data_folder + "height_statistics_L%i_%i.pickle" % (length, num_cycles)
+
+
+def statistics_task(length: int, repetition: int, seed, num_cycles: int, p: float) -> HeightAccumulator:
+    """
+    Accumulate the statistics of the pile height after each of `num_cycles`
+    steady state cycles, for a single system of the given length, without
+    keeping the heights themselves, so memory use doesn't grow with
+    `num_cycles`. Progress is checkpointed, and resumed from on a rerun,
+    and the final checkpoint is kept until the statistics are saved.
+    """
+    checkpoint = checkpoint_path(statistics_path(length, num_cycles), repetition)
+
+    def save(done: int) -> None:
+        save_checkpoint(checkpoint, {"model": model.get_state(),
+                                     "accumulator": accumulator, "done": done})
+
+    # resume from the last checkpoint, if there is one
+    state = load_checkpoint(checkpoint)
+    if state is None:
+        model = steady_state_model(length, p, seed)
+        accumulator = HeightAccumulator()
+        done = 0
+        save(done)
+    else:
+        model = Model.from_state(state["model"])
+        accumulator = state["accumulator"]
+        done = state["done"]
+
+    while done < num_cycles:
+        for _ in range(min(CHUNK_SIZE, num_cycles - done)):
+            model.cycle()
+            accumulator.add(model.pile_height)
+        done = min(done + CHUNK_SIZE, num_cycles)
+        save(done)
+    return accumulator
+
+
+def get_height_statistics(seed=None, workers: int | None = None, num_cycles: int | None = None,
+                          repetitions: int = 1) -> tuple[list[int], list[HeightAccumulator]]:
+    """
+    Returns (lengths, accumulators), with the pile height statistics
+    of each length in a `HeightAccumulator`.
+    By default these are of the saved heights series, from `get_heights_data`.
+    Given `num_cycles`, they are instead of `repetitions` separate runs of
+    `num_cycles` cycles per length, merged, which run in constant memory,
+    so can be far longer. These are saved, and generated if they haven't been.
+    """
+    if num_cycles is None:
+        lengths, height_sequence_list = get_heights_data(seed, workers)
+        accumulators = []
+        for data in height_sequence_list:
+            accumulator = HeightAccumulator()
+            # a chunk at a time, so the series is never all in memory
+            for start in range(0, len(data), CHUNK_SIZE):
+                accumulator.add_array(data[start:start + CHUNK_SIZE])
+            accumulators.append(accumulator)
+        return (lengths, accumulators)
+
+    lengths = [4, 8, 16, 32, 64, 128, 256, 512]
+    p = 0.5
+    paths = [statistics_path(length, num_cycles) for length in lengths]
+    try:
+        accumulators = []
+        for path in paths:
+            with open(path, "rb") as f:
+                saved = pickle.load(f)
+            if saved["repetitions"] != repetitions:
+                raise Exception("Saved statistics have a different number of repetitions")
+            accumulators.append(saved["accumulator"])
+    except:
+        results = run_sweep(statistics_task, lengths, repetitions, seed=seed,
+                            workers=workers, args=(num_cycles, p))
+        accumulators = []
+        for i in range(len(lengths)):
+            accumulator = HeightAccumulator()
+            for result in results[i]:
+                accumulator.merge(result)
+            save_checkpoint(paths[i], {"repetitions": repetitions,
+                                       "accumulator": accumulator})
+            remove_checkpoints(paths[i], repetitions)
+            accumulators.append(accumulator)
+    return (lengths, accumulators)
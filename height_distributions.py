@@ -0,0 +1,88 @@
+# Python 3.10.6
+# =========================================================
+# Pile height probability distributions, without plotting
+# =========================================================
+
+import numpy as np
+
+# number of heights counted at a time from a series
+CHUNK_SIZE = 2**20
+
+
+def height_histogram(heights) -> np.ndarray:
+    """
+    The number of times each pile height appears in `heights`, indexed by
+    height, counted a chunk at a time, so `heights` can be memory mapped.
+    """
+    count = np.zeros(0, dtype=np.int64)
+    for start in range(0, len(heights), CHUNK_SIZE):
+        chunk_count = np.bincount(np.asarray(heights[start:start + CHUNK_SIZE]))
+        if len(chunk_count) > len(count):
+            chunk_count[:len(count)] += count
+            count = chunk_count
+        else:
+            count[:len(chunk_count)] += chunk_count
+    return count
+
+
+def distribution(count) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (heights, probabilities), P(h;L) for every height from the
+    lowest to the highest seen, given the count of each height, e.g. from
+    `height_histogram` or `HeightAccumulator.get_histogram`.
+    Heights in between which were never seen have probability 0.
+    """
+    count = np.asarray(count)
+    seen = np.nonzero(count)[0]
+    heights = np.arange(seen[0], seen[-1] + 1)
+    return (heights, count[heights] / np.sum(count))
+
+
+def mean_and_std(count) -> tuple[float, float]:
+    """
+    The mean and population standard deviation of the height, from its count.
+    """
+    count = np.asarray(count)
+    heights = np.arange(len(count))
+    n = np.sum(count)
+    mean = np.sum(heights * count) / n
+    return (mean, np.sqrt(np.sum((heights - mean)**2 * count) / n))
+
+
+def gaussian(x):
+    """
+    The standard normal probability density.
+    """
+    return (1 / np.sqrt(2*np.pi)) * np.exp(-0.5*np.asarray(x)**2)
+
+
+def standardised_distribution(count) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (x, y), the distribution of the standardised height,
+    x = (h - <h>) / sigma_h, with y = sigma_h * P(h;L), which collapses
+    onto the standard normal if the central limit theorem holds.
+    """
+    heights, probabilities = distribution(count)
+    mean, std = mean_and_std(count)
+    return ((heights - mean) / std, probabilities * std)
+
+
+def gaussian_deviation(count) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (x, y), the standardised height, and the deviation of its
+    distribution from the standard normal, relative to the standard normal.
+    """
+    x, y = standardised_distribution(count)
+    return (x, y / gaussian(x) - 1)
+
+
+def collapse_all(counts: list) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    The standardised distribution of every count in `counts`, e.g. one
+    for each length, as a list of (x, y, deviation) arrays.
+    """
+    results = []
+    for count in counts:
+        x, y = standardised_distribution(count)
+        results.append((x, y, y / gaussian(x) - 1))
+    return results
@@ -1,95 +1,154 @@
-################################################################################
-# Max Falkenberg McGillivray
-# mff113@ic.ac.uk
-# 2019 Complexity & Networks course
-#
-# logbin230119.py v2.0
-# 23/01/2019
-# Email me if you find any bugs!
-#
-# For details on data binning see Appendix E from
-# K. Christensen and N.R. Moloney, Complexity and Criticality,
-# Imperial College Press (2005).
-################################################################################
-
-import numpy as np
-
-def logbin(data, scale = 1., zeros = False):
-    """
-    logbin(data, scale = 1., zeros = False)
-
-    Log-bin frequency of unique integer values in data. Returns probabilities
-    for each bin.
-
-    Array, data, is a 1-d array containing full set of event sizes for a
-    given process in no particular order. For instance, in the Oslo Model
-    the array may contain the avalanche size recorded at each time step. For
-    a complex network, the array may contain the degree of each node in the
-    network. The logbin function finds the frequency of each unique value in
-    the data array. The function then bins these frequencies in logarithmically
-    increasing bin sizes controlled by the scale parameter.
-
-    Minimum binsize is always 1. Bin edges are lowered to nearest integer. Bins
-    are always unique, i.e. two different float bin edges corresponding to the
-    same integer interval will not be included twice. Note, rounding to integer
-    values results in noise at small event sizes.
-
-    Parameters
-    ----------
-
-    data: array_like, 1 dimensional, non-negative integers
-          Input array. (e.g. Raw avalanche size data in Oslo model.)
-
-    scale: float, greater or equal to 1.
-          Scale parameter controlling the growth of bin sizes.
-          If scale = 1., function will return frequency of each unique integer
-          value in data with no binning.
-
-    zeros: boolean
-          Set zeros = True if you want binning function to consider events of
-          size 0.
-          Note that output cannot be plotted on log-log scale if data contains
-          zeros. If zeros = False, events of size 0 will be removed from data.
-
-    Returns
-    -------
-
-    x: array_like, 1 dimensional
-          Array of coordinates for bin centres calculated using geometric mean
-          of bin edges. Bins with a count of 0 will not be returned.
-    y: array_like, 1 dimensional
-          Array of normalised frequency counts within each bin. Bins with a
-          count of 0 will not be returned.
-    """
-    if scale < 1:
-        raise ValueError('Function requires scale >= 1.')
-    count = np.bincount(data)
-    tot = np.sum(count)
-    smax = np.max(data)
-    if scale > 1:
-        jmax = np.ceil(np.log(smax)/np.log(scale))
-        if zeros:
-            binedges = scale ** np.arange(jmax + 1)
-            binedges[0] = 0
-        else:
-            binedges = scale ** np.arange(1,jmax + 1)
-            # count = count[1:]
-        binedges = np.unique(binedges.astype('uint64'))
-        x = (binedges[:-1] * (binedges[1:]-1)) ** 0.5
-        y = np.zeros_like(x)
-        count = count.astype('float')
-        for i in range(len(y)):
-            y[i] = np.sum(count[binedges[i]:binedges[i+1]]/(binedges[i+1] - binedges[i]))
-            # print(binedges[i],binedges[i+1])
-        # print(smax,jmax,binedges,x)
-        # print(x,y)
-    else:
-        x = np.nonzero(count)[0]
-        y = count[count != 0].astype('float')
-        if zeros != True and x[0] == 0:
-            x = x[1:]
-            y = y[1:]
-    y /= tot
-    x = x[y!=0]
-    y = y[y!=0]
-    return x,y
+################################################################################
+# Max Falkenberg McGillivray
+# mff113@ic.ac.uk
+# 2019 Complexity & Networks course
+#
+# logbin230119.py v2.0
+# 23/01/2019
+# Email me if you find any bugs!
+#
+# For details on data binning see Appendix E from
+# K. Christensen and N.R. Moloney, Complexity and Criticality,
+# Imperial College Press (2005).
+################################################################################
+
+import numpy as np
+
+def logbin(data, scale = 1., zeros = False, errors = False):
+    """
+    logbin(data, scale = 1., zeros = False, errors = False)
+
+    Log-bin frequency of unique integer values in data. Returns probabilities
+    for each bin.
+
+    Array, data, is a 1-d array containing full set of event sizes for a
+    given process in no particular order. For instance, in the Oslo Model
+    the array may contain the avalanche size recorded at each time step. For
+    a complex network, the array may contain the degree of each node in the
+    network. The logbin function finds the frequency of each unique value in
+    the data array. The function then bins these frequencies in logarithmically
+    increasing bin sizes controlled by the scale parameter.
+
+    Minimum binsize is always 1. Bin edges are lowered to nearest integer. Bins
+    are always unique, i.e. two different float bin edges corresponding to the
+    same integer interval will not be included twice. Note, rounding to integer
+    values results in noise at small event sizes.
+
+    Parameters
+    ----------
+
+    data: array_like, 1 dimensional, non-negative integers
+          Input array. (e.g. Raw avalanche size data in Oslo model.)
+
+    scale: float, greater or equal to 1.
+          Scale parameter controlling the growth of bin sizes.
+          If scale = 1., function will return frequency of each unique integer
+          value in data with no binning.
+
+    zeros: boolean
+          Set zeros = True if you want binning function to consider events of
+          size 0.
+          Note that output cannot be plotted on log-log scale if data contains
+          zeros. If zeros = False, events of size 0 will be removed from data.
+
+    errors: boolean
+          Set errors = True to also return the counting (Poisson) error on
+          each normalised frequency.
+
+    Returns
+    -------
+
+    x: array_like, 1 dimensional
+          Array of coordinates for bin centres calculated using geometric mean
+          of bin edges. Bins with a count of 0 will not be returned.
+    y: array_like, 1 dimensional
+          Array of normalised frequency counts within each bin. Bins with a
+          count of 0 will not be returned.
+    y_err: array_like, 1 dimensional
+          Only if errors = True. Array of the error on each value of y.
+    """
+    return logbin_histogram(np.bincount(data), scale, zeros, errors)
+
+def bin_edges(smax, scale, zeros = False):
+    """
+    bin_edges(smax, scale, zeros = False)
+
+    Integer bin edges for log-binning values up to smax, with scale > 1.
+    Edges are powers of scale, so the edges for a smaller smax are the
+    start of those for a larger one, and one set can be shared by a batch.
+    """
+    jmax = np.ceil(np.log(smax)/np.log(scale))
+    if zeros:
+        binedges = scale ** np.arange(jmax + 1)
+        binedges[0] = 0
+    else:
+        binedges = scale ** np.arange(1,jmax + 1)
+    return np.unique(binedges.astype('uint64')).astype(np.int64)
+
+def logbin_histogram(count, scale = 1., zeros = False, errors = False,
+                     binedges = None):
+    """
+    logbin_histogram(count, scale = 1., zeros = False, errors = False,
+                     binedges = None)
+
+    As logbin, but from the frequency of each integer value, count[s], rather
+    than the raw data, e.g. from an AvalancheHistogram. This gives the same
+    result as logbin on the data, without the data ever being in memory.
+    """
+    if scale < 1:
+        raise ValueError('Function requires scale >= 1.')
+    count = np.asarray(count)
+    tot = np.sum(count)
+    if scale > 1:
+        smax = np.nonzero(count)[0][-1]
+        if binedges is None:
+            binedges = bin_edges(smax, scale, zeros)
+        else:
+            # shared edges go beyond this data, so stop at the first edge
+            # at or above smax, as bin_edges(smax, ...) would
+            binedges = binedges[:np.searchsorted(binedges, smax) + 1]
+        if len(binedges) < 2:
+            # every value is below the first edge, so there are no bins
+            empty = np.array([])
+            return (empty, empty, empty) if errors else (empty, empty)
+        widths = binedges[1:] - binedges[:-1]
+        x = (binedges[:-1] * (binedges[1:]-1)) ** 0.5
+        # only counts below the last edge are binned, padded if short
+        if len(count) >= binedges[-1]:
+            binned = count[:binedges[-1]]
+        else:
+            binned = np.zeros(binedges[-1], dtype=count.dtype)
+            binned[:len(count)] = count
+        # sum each bin in one reduction, in integers so nothing is lost
+        n_bin = np.add.reduceat(binned, binedges[:-1])
+        y = n_bin / widths
+        y_err = np.sqrt(n_bin) / widths
+    else:
+        x = np.nonzero(count)[0]
+        y = count[x].astype('float')
+        y_err = np.sqrt(y)
+        if zeros != True and x[0] == 0:
+            x = x[1:]
+            y = y[1:]
+            y_err = y_err[1:]
+    y /= tot
+    y_err /= tot
+    nonzero = y != 0
+    if errors:
+        return x[nonzero], y[nonzero], y_err[nonzero]
+    return x[nonzero], y[nonzero]
+
+def logbin_batch(counts, scale = 1., zeros = False, errors = False):
+    """
+    logbin_batch(counts, scale = 1., zeros = False, errors = False)
+
+    logbin_histogram of every histogram in counts, e.g. one for each system
+    length, returned as a list of results. Bin edges are found once, for
+    the largest value in any histogram, and shared by all of them.
+    """
+    binedges = None
+    if scale > 1:
+        smax = max(np.nonzero(count)[0][-1] for count in counts)
+        binedges = bin_edges(smax, scale, zeros)
+    return [logbin_histogram(count, scale, zeros, errors, binedges)
+            for count in counts]
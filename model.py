@@ -3,35 +3,106 @@
 # The model itself, used by all other scripts
 # =========================================================
 
+from collections.abc import Sequence
+from itertools import accumulate
 import numpy as np
-import random
-import matplotlib.pyplot as plt
-from utils import figures_folder
+from observers import Observer, TransitionCountObserver
+
+# number of thresholds drawn from the random generator at once
+THRESHOLD_BLOCK = 4096
+
+
+def spawn_seeds(seed, n: int) -> list[np.random.SeedSequence]:
+    """
+    Spawn `n` independent seed sequences from a single `seed`,
+    which may be an int, None or a `np.random.SeedSequence`.
+    Each can be given to a separate `Model`, e.g. in a parallel sweep,
+    and the whole sweep replayed from the same `seed`.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    # as seed.spawn(n) on a fresh sequence, but without changing `seed`,
+    # which would give different children the next time it is used
+    return [np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key + (i,),
+                                   pool_size=seed.pool_size)
+            for i in range(n)]
+
 
 
 class Model:
-    def __init__(self, length: int, p: float = 0.5) -> None:
+    # a fixed set of attributes, so no per-instance dictionary
+    __slots__ = ("length", "p", "checked", "gradients", "thresholds",
+                 "pile_height", "is_transient", "rng", "threshold_buffer",
+                 "buffer_position")
+
+    def __init__(self, length: int, p: float = 0.5, seed=None, checked: bool = False) -> None:
         """
         Initialise a new Oslo model of a given length
         Optionally set p, the probability of a threshold being 2
         rather than 1, default = 0.5 so 50:50 chance of 1 or 2.
         Setting p=0 leads to the Bak Tang & Wiesenfeld model.
+        Optionally set seed, an int, `np.random.SeedSequence` or
+        `np.random.Generator` used for all thresholds, so runs can be replayed.
+        Setting checked=True validates the state after every cycle,
+        which is slow and only intended for debugging.
         """
         # min system length of 3
         if length < 3:
             raise Exception("Min length is 3")
         self.length: int = length
-        # generate empty gradient and threshold lists
-        self.gradients: list[int] = [0] * length
-        self.thresholds: list[int] = [0] * length
+        self.checked: bool = checked
+        # generate empty gradient and threshold arrays, one byte per site
+        self.gradients: bytearray = bytearray(length)
+        self.thresholds: bytearray = bytearray(length)
+        # the height at site 0, kept up to date by driving and relaxation
+        self.pile_height: int = 0
         # the system always starts in the transient state
         self.is_transient: bool = True
         # set the probability of threshold being 2 to p
         self.p = p
+        # thresholds are drawn in blocks from this instance's own generator
+        self.rng: np.random.Generator = np.random.default_rng(seed)
+        self.refill_thresholds()
         # randomise each of the new threshold values
         for i in range(length):
             self.new_threshold(i)
 
+    def get_state(self) -> dict:
+        """
+        Get a copy of the full state of the model, including the random
+        generator, from which `Model.from_state` continues identically.
+        """
+        return {
+            "length": self.length,
+            "p": self.p,
+            "gradients": bytes(self.gradients),
+            "thresholds": bytes(self.thresholds),
+            "pile_height": self.pile_height,
+            "is_transient": self.is_transient,
+            "rng": self.rng.bit_generator.state,
+            "threshold_buffer": self.threshold_buffer,
+            "buffer_position": self.buffer_position,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict, seed=None, checked: bool = False) -> "Model":
+        """
+        Create a model from a state given by `get_state`.
+        If the state has no random generator, e.g. a cached steady state
+        from `steady_states.py`, or `seed` is given, the model instead
+        starts a fresh random stream from `seed`.
+        """
+        model = cls(state["length"], state["p"], seed, checked)
+        model.gradients[:] = state["gradients"]
+        model.thresholds[:] = state["thresholds"]
+        model.pile_height = state["pile_height"]
+        model.is_transient = state["is_transient"]
+        if "rng" in state and seed is None:
+            model.rng.bit_generator.state = state["rng"]
+            model.threshold_buffer = state["threshold_buffer"]
+            model.buffer_position = state["buffer_position"]
+        return model
+
     def get_length(self) -> int:
         """
         Get the length of the system.
@@ -42,7 +113,7 @@ class Model:
         """
         Get a list of all gradients.
         """
-        return self.gradients
+        return list(self.gradients)
 
     def get_single_gradient(self, i: int) -> int:
         """
@@ -55,7 +126,7 @@ class Model:
         """
         Get a list of all thresholds.
         """
-        return self.thresholds
+        return list(self.thresholds)
 
     def get_single_threshold(self, i: int) -> int:
         """
@@ -71,25 +142,32 @@ class Model:
         requires running many computations rather than 
         accessing a class attribute.
         """
-        heights: list[int] = []
-        for i in range(len(self.gradients)):
-            heights.append(self.get_height(i))
+        # the height at each site is the sum of all gradients from it to the end
+        heights = list(accumulate(reversed(self.gradients)))
+        heights.reverse()
         return heights
 
+    def get_all_heights_array(self) -> np.ndarray:
+        """
+        Get an array of all the heights, as for `get_all_heights`.
+        """
+        gradients = np.frombuffer(self.gradients, dtype=np.uint8)
+        return np.cumsum(gradients[::-1], dtype=np.int64)[::-1]
+
     def get_height(self, i: int) -> int:
         """
         Get height at position `i`
         Where `i` starts from 0.
         """
         self.check_index_in_range(i)
-        return np.sum(self.gradients[i:len(self.gradients)])
+        return self.pile_height - sum(self.gradients[:i])
 
     def get_pile_height(self) -> int:
         """
         Get the height of the pile, i.e. the height of
         the pile at site `i == 0`.
         """
-        return self.get_height(0)
+        return self.pile_height
 
     def get_is_transient(self) -> bool:
         """
@@ -106,6 +184,43 @@ class Model:
         if i >= self.length or i < 0:
             raise Exception("Index out of range")
 
+    def check_state(self) -> None:
+        """
+        Check the system is stable, every threshold is 1 or 2
+        and the pile height matches the gradients.
+        If not, raises an exception.
+        Used after every cycle when the model is checked.
+        """
+        if len(self.gradients) != self.length or len(self.thresholds) != self.length:
+            raise Exception("State does not match length")
+        for i in range(self.length):
+            if self.thresholds[i] not in (1, 2):
+                raise Exception("Invalid threshold at site %i" % i)
+            if self.gradients[i] > self.thresholds[i]:
+                raise Exception("Supercritical site %i after cycle" % i)
+        if self.pile_height != sum(self.gradients):
+            raise Exception("Pile height does not match gradients")
+
+    def refill_thresholds(self) -> bytes:
+        """
+        Draw the next block of `THRESHOLD_BLOCK` thresholds, each 2 with
+        chance `p` and 1 with chance `1-p`, and return it.
+        """
+        block = (self.rng.random(THRESHOLD_BLOCK) < self.p).astype(np.uint8) + 1
+        self.threshold_buffer: bytes = block.tobytes()
+        self.buffer_position: int = 0
+        return self.threshold_buffer
+
+    def next_threshold(self) -> int:
+        """
+        Take the next threshold from the buffered block.
+        """
+        if self.buffer_position == THRESHOLD_BLOCK:
+            self.refill_thresholds()
+        threshold = self.threshold_buffer[self.buffer_position]
+        self.buffer_position += 1
+        return threshold
+
     def new_threshold(self, i: int) -> None:
         """
         Set a new threshold at position `i`.
@@ -113,14 +228,14 @@ class Model:
         chance `1-p`.
         """
         self.check_index_in_range(i)
-        self.thresholds[i] = random.choices(
-            population=[1, 2], weights=[1-self.p, self.p])[0]
+        self.thresholds[i] = self.next_threshold()
 
     def drive(self) -> None:
         """
         Add a single grain to the first position
         """
         self.gradients[0] += 1
+        self.pile_height += 1
 
     def is_supercritical(self, i: int) -> bool:
         """
@@ -134,72 +249,134 @@ class Model:
         Relax site `i`, assuming it is supercritical.
         """
         self.check_index_in_range(i)
-        # update the gradients accordingly
+        # update the gradients accordingly, ensuring no values are below zero
+        gradient = self.gradients[i]
         if i == 0:
-            self.gradients[i] -= 2
+            self.gradients[i] = max(gradient - 2, 0)
             self.gradients[i+1] += 1
+            added = 1
         elif i == self.length - 1:
             # end relaxation marks the transition to steady state
             if self.is_transient:
                 self.is_transient = False
-            self.gradients[i] -= 1
+            self.gradients[i] = max(gradient - 1, 0)
             self.gradients[i-1] += 1
+            added = 1
         else:
-            self.gradients[i] -= 2
+            self.gradients[i] = max(gradient - 2, 0)
             self.gradients[i-1] += 1
             self.gradients[i+1] += 1
-        # ensure no values are below zero
-        if self.gradients[i] < 0:
-            self.gradients[i] = 0
+            added = 2
+        # the pile height is the sum of the gradients, so changes by what
+        # was added less what was actually removed, allowing for clipping,
+        # i.e. down by one for site 0 and unchanged elsewhere unless clipped
+        self.pile_height += added - (gradient - self.gradients[i])
         # reset threshold
         self.new_threshold(i)
 
-    def cycle(self) -> None:
-        """
-        Perform one complete system cycle of driving and relaxation.
-        """
+    # the cycle method below inlines `is_supercritical`, `relax` and
+    # `next_threshold`, without index checks, since it is the hot loop.
+    # a supercritical site has gradient of at least 2, so never goes negative.
+    # the sites which may still be supercritical are always those between the
+    # pointer and the avalanche limit, one site right of the furthest
+    # relaxation, so the pointer works through them as a stack and each cycle
+    # costs work proportional to the avalanche, not the system length
+
+    def cycle(self, observers: Sequence[Observer] = ()) -> int:
+        """
+        Perform one complete system cycle of driving and relaxation and
+        return the number of relaxations, i.e. the size of the avalanche.
+        Each of `observers` is told about the start of the cycle, every
+        relaxation and the end of the cycle, see `observers.py`.
+        """
+        gradients = self.gradients
+        thresholds = self.thresholds
+        buffer = self.threshold_buffer
+        position = self.buffer_position
+        last = self.length - 1
+        # only call observers if there are any
+        observed = len(observers) > 0
+        called = observers
+        recording = False
         # add a grain to the first position
-        self.drive()
+        gradients[0] += 1
+        height = self.pile_height + 1
+        self.pile_height = height
+        if observed:
+            for observer in observers:
+                observer.start(self)
+            # an observer which records events has each relaxation appended
+            # straight to its buffers, rather than a call per relaxation
+            recorders = [observer for observer in observers if observer.records_events]
+            if recorders:
+                if len(recorders) > 1:
+                    raise Exception("Only one event recording observer per cycle")
+                recording = True
+                append_event = recorders[0].event_buffer.append
+                called = [observer for observer in observers if not observer.records_events]
         # relax all positions until stable
         pointer = 0
         # keep track of the right most avalanche site
         avalanche_limit = 0
+        counter = 0
         # if pointer to the right of the avalanche limit, no possible further avalanches
-        while pointer < self.length and pointer <= avalanche_limit:
+        while pointer <= avalanche_limit:
             # if this site is super critical
-            if self.is_supercritical(pointer):
+            if gradients[pointer] > thresholds[pointer]:
                 # relax the site
-                self.relax(pointer)
+                if pointer == 0:
+                    gradients[0] -= 2
+                    gradients[1] += 1
+                    height -= 1
+                elif pointer == last:
+                    self.is_transient = False
+                    gradients[last] -= 1
+                    gradients[last-1] += 1
+                else:
+                    gradients[pointer] -= 2
+                    gradients[pointer-1] += 1
+                    gradients[pointer+1] += 1
+                initial_threshold = thresholds[pointer]
+                if position == THRESHOLD_BLOCK:
+                    buffer = self.refill_thresholds()
+                    position = 0
+                thresholds[pointer] = buffer[position]
+                position += 1
+                counter += 1
+                if observed:
+                    if recording:
+                        # the site and new threshold, packed in one int
+                        append_event(pointer << 2 | thresholds[pointer])
+                    if called:
+                        # keep the model consistent for the observers
+                        self.pile_height = height
+                        self.buffer_position = position
+                        for observer in called:
+                            observer.relaxed(self, pointer, initial_threshold)
                 # update the avalanche site to current site + 1
-                avalanche_limit = max(avalanche_limit, pointer + 1)
+                if pointer < last and pointer + 1 > avalanche_limit:
+                    avalanche_limit = pointer + 1
                 # update the pointer
-                pointer -= 1
-                if pointer < 0:
-                    pointer = 0
+                if pointer > 0:
+                    pointer -= 1
             # if position not supercritical, move right by one
             else:
                 pointer += 1
+        self.pile_height = height
+        self.buffer_position = position
+        if observed:
+            for observer in observers:
+                observer.finish(self)
+        if self.checked:
+            self.check_state()
+        return counter
 
     def cycle_with_relax_count(self) -> int:
         """
         Perform one system cycle of driving and relaxation and return the 
         number of relaxations, i.e. the size of the avalanche.
         """
-        # add a grain to the first position
-        self.drive()
-        # relax all positions until stable
-        pointer = 0
-        counter = 0
-        while pointer < self.length:
-            if self.is_supercritical(pointer):
-                self.relax(pointer)
-                # difference to regular cycle is this counter
-                counter += 1
-                pointer -= 1
-                if pointer < 0:
-                    pointer = 0
-            else:
-                pointer += 1
+        counter = self.cycle()
         # check values aren't approaching the 32 bit limit
         if counter > 2e9:
             raise Exception("Counter approaching 32 bit limit")
@@ -210,63 +387,15 @@ class Model:
         Perform one system cycle and return counts of each threshold transition,
         including sites adjacent to a relaxation which didn't exceed criticality.
         """
-        # setup a dictionary to store the counts
-        counts = {
-            1: {
-                1: 0,
-                2: 0
-            },
-            2: {
-                1: 0,
-                2: 0
-            }
-        }
-        # add a grain to the first position
-        self.drive()
-        # relax all positions until stable
-        pointer = 0
-        while pointer < self.length:
-            if self.is_supercritical(pointer):
-                # given current site is supercritical, count the transition
-                initial_threshold = self.get_single_threshold(pointer)
-                self.relax(pointer)
-                final_threshold = self.get_single_threshold(pointer)
-                counts[initial_threshold][final_threshold] += 1
-                # given a relaxation just occurred, count adjacent sites only if
-                # sub critical, else they'll be counted twice when they relax
-                if pointer > 0 and pointer < self.length - 1:
-                    if not self.is_supercritical(pointer-1):
-                        threshold = self.get_single_threshold(pointer-1)
-                        counts[threshold][threshold] += 1
-                    if not self.is_supercritical(pointer+1):
-                        threshold = self.get_single_threshold(pointer+1)
-                        counts[threshold][threshold] += 1
-
-                pointer -= 1
-                if pointer < 0:
-                    pointer = 0
-            else:
-                pointer += 1
-        return counts
+        observer = TransitionCountObserver()
+        self.cycle((observer,))
+        return observer.counts
 
     def plot(self, save_as: str = "plot.svg") -> None:
         """
         Plot the current state of the system and save it to an svg.
+        Plotting is imported only now, so the model itself never loads
+        matplotlib, e.g. in sweep workers.
         """
-        # get the current state of the system
-        heights = self.get_all_heights()
-        # construct a figure
-        fig = plt.figure(figsize=(3, 6))
-        ax = fig.add_subplot(111)
-        # plot the heights as a bar chart
-        ax.bar(np.array(range(self.length)) + 1,
-               heights, width=0.95, color='grey')
-        ax.axis('scaled')
-        ax.set_ylabel("Height")
-        ax.set_xlabel("Site, $i$")
-        if len(heights) <= 8:
-            ax.set_yticks(range(max(heights) + 1))
-            ax.set_xticks(np.array(range(self.length)) + 1)
-            ax.grid(axis='y')
-        plt.savefig(figures_folder + save_as,
-                    format='svg', bbox_inches='tight')
+        from plotting import plot_model
+        plot_model(self, save_as)
@@ -0,0 +1,58 @@
+# Python 3.10.6
+# =========================================================
+# Moments of the avalanche size, from a histogram of sizes
+# =========================================================
+
+from fractions import Fraction
+import numpy as np
+
+
+def log_moments(count, orders: list[int]) -> np.ndarray:
+    """
+    The natural log of every moment <s^k>, for each k in `orders`, of the
+    sizes counted in the histogram `count`, where count[s] is the number of
+    avalanches of size s.
+    Sums are taken in log space, so no power of s ever overflows, however
+    large the avalanches or the orders.
+    """
+    count = np.asarray(count)
+    sizes = np.nonzero(count)[0]
+    # an avalanche of size 0 adds nothing to any moment with k > 0
+    sizes = sizes[sizes > 0]
+    log_sizes = np.log(sizes)
+    log_counts = np.log(count[sizes].astype(float))
+    # log(n_s * s^k) for every order and size at once
+    terms = np.outer(orders, log_sizes) + log_counts
+    largest = np.max(terms, axis=1)
+    log_sums = largest + np.log(np.sum(np.exp(terms - largest[:, None]), axis=1))
+    return log_sums - np.log(np.sum(count))
+
+
+def moments(count, orders: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (moments, errors), the moments <s^k> for each k in `orders`
+    of the sizes counted in the histogram `count`, along with the standard
+    error on each, treating avalanches as independent.
+    The standard error of <s^k> comes from <s^2k>, so needs no more data.
+    """
+    orders = list(orders)
+    n = np.sum(count)
+    log_values = log_moments(count, orders + [2 * k for k in orders])
+    log_moment, log_square_moment = log_values[:len(orders)], log_values[len(orders):]
+    values = np.exp(log_moment)
+    # var(s^k) / <s^k>^2 = <s^2k> / <s^k>^2 - 1, which never overflows
+    relative_variance = np.maximum(np.exp(log_square_moment - 2 * log_moment) - 1, 0)
+    errors = values * np.sqrt(relative_variance / n)
+    return (values, errors)
+
+
+def exact_moment(count, order: int) -> Fraction:
+    """
+    The `order`th moment <s^k> of the sizes counted in the histogram `count`,
+    exactly, as a fraction of Python ints. Much slower than `moments`,
+    for checking it, or when more than double precision is needed.
+    """
+    count = np.asarray(count)
+    sizes = np.nonzero(count)[0]
+    total = sum(int(n) * int(s)**order for s, n in zip(sizes, count[sizes]))
+    return Fraction(total, int(np.sum(count)))
@@ -0,0 +1,194 @@
+# Python 3.10.6
+# =========================================================
+# Observers, which measure the model during Model.cycle
+# =========================================================
+
+from array import array
+
+
+class Observer:
+    """
+    Base class for anything measured during a cycle.
+    Pass instances to `Model.cycle`, which calls `start` after the drive,
+    `relaxed` after every relaxation and `finish` once the system is stable.
+    Each observer only needs to override the methods it uses.
+    An observer with `records_events` set instead has every relaxation
+    appended straight to its `event_buffer` array by `Model.cycle`, as
+    `site << 2 | new_threshold`, which is far cheaper than a call.
+    """
+
+    records_events: bool = False
+
+    def start(self, model) -> None:
+        """
+        Called once the grain has been added, before any relaxation.
+        """
+        pass
+
+    def relaxed(self, model, i: int, initial_threshold: int) -> None:
+        """
+        Called after site `i` has relaxed, with its threshold before
+        relaxing. The new threshold is `model.thresholds[i]`.
+        """
+        pass
+
+    def finish(self, model) -> None:
+        """
+        Called once the system is stable again.
+        """
+        pass
+
+
+class RelaxCountObserver(Observer):
+    """
+    Count the relaxations in each cycle, i.e. the avalanche size.
+    """
+
+    def __init__(self) -> None:
+        self.count: int = 0
+
+    def start(self, model) -> None:
+        self.count = 0
+
+    def relaxed(self, model, i: int, initial_threshold: int) -> None:
+        self.count += 1
+
+
+class TransitionCountObserver(Observer):
+    """
+    Count each threshold transition in a cycle, including sites adjacent
+    to a relaxation which didn't exceed criticality.
+    """
+
+    def __init__(self) -> None:
+        self.counts: dict[int, dict[int, int]] = {}
+        self.start(None)
+
+    def start(self, model) -> None:
+        # setup a dictionary to store the counts
+        self.counts = {
+            1: {
+                1: 0,
+                2: 0
+            },
+            2: {
+                1: 0,
+                2: 0
+            }
+        }
+
+    def relaxed(self, model, i: int, initial_threshold: int) -> None:
+        gradients = model.gradients
+        thresholds = model.thresholds
+        counts = self.counts
+        # given current site is supercritical, count the transition
+        counts[initial_threshold][thresholds[i]] += 1
+        # given a relaxation just occurred, count adjacent sites only if
+        # sub critical, else they'll be counted twice when they relax
+        if i > 0 and i < model.length - 1:
+            threshold = thresholds[i-1]
+            if gradients[i-1] <= threshold:
+                counts[threshold][threshold] += 1
+            threshold = thresholds[i+1]
+            if gradients[i+1] <= threshold:
+                counts[threshold][threshold] += 1
+
+
+class OutflowObserver(Observer):
+    """
+    Count the grains leaving the end of the system in each cycle.
+    """
+
+    def __init__(self) -> None:
+        self.outflow: int = 0
+
+    def start(self, model) -> None:
+        self.outflow = 0
+
+    def relaxed(self, model, i: int, initial_threshold: int) -> None:
+        if i == model.length - 1:
+            self.outflow += 1
+
+
+class ActivityObserver(Observer):
+    """
+    Count the relaxations at every site, over all observed cycles.
+    """
+
+    def __init__(self, length: int) -> None:
+        self.activity: list[int] = [0] * length
+
+    def relaxed(self, model, i: int, initial_threshold: int) -> None:
+        self.activity[i] += 1
+
+
+class AvalancheObserver(Observer):
+    """
+    Record the size, area, extent, drop number and duration of every
+    observed avalanche, in typed arrays, one value per cycle.
+    The area is the number of distinct sites relaxed, the extent the span
+    from the leftmost to rightmost site relaxed and the drop number the
+    grains leaving the end of the system.
+    The duration is counted in generations of the parallel update, taking
+    each relaxation to be one generation after the last grain reached its
+    site, which is approximate, since the model relaxes sites in turn.
+    """
+
+    def __init__(self, length: int) -> None:
+        self.sizes = array("I")
+        self.areas = array("I")
+        self.extents = array("I")
+        self.drops = array("I")
+        self.durations = array("I")
+        # per site, whether relaxed and the generation of its last grain,
+        # reset after each avalanche only where it reached
+        self.relaxed_sites = bytearray(length)
+        self.generations: list[int] = [0] * length
+        self.start(None)
+
+    def start(self, model) -> None:
+        self.size = 0
+        self.area = 0
+        self.drop = 0
+        self.duration = 0
+        self.leftmost = -1
+        self.rightmost = -1
+
+    def relaxed(self, model, i: int, initial_threshold: int) -> None:
+        generations = self.generations
+        generation = generations[i] + 1
+        generations[i] = generation
+        if generation > self.duration:
+            self.duration = generation
+        # grains passed on to the neighbours arrive in this generation
+        if i > 0 and generations[i-1] < generation:
+            generations[i-1] = generation
+        if i < model.length - 1:
+            if generations[i+1] < generation:
+                generations[i+1] = generation
+        else:
+            self.drop += 1
+        self.size += 1
+        if not self.relaxed_sites[i]:
+            self.relaxed_sites[i] = 1
+            self.area += 1
+            if self.leftmost < 0 or i < self.leftmost:
+                self.leftmost = i
+            if i > self.rightmost:
+                self.rightmost = i
+
+    def finish(self, model) -> None:
+        self.sizes.append(self.size)
+        self.areas.append(self.area)
+        self.drops.append(self.drop)
+        self.durations.append(self.duration)
+        if self.size == 0:
+            self.extents.append(0)
+            return
+        self.extents.append(self.rightmost - self.leftmost + 1)
+        # clear the avalanche, and the grains it passed just beyond
+        self.relaxed_sites[self.leftmost:self.rightmost + 1] = \
+            bytes(self.rightmost - self.leftmost + 1)
+        lo = max(self.leftmost - 1, 0)
+        hi = min(self.rightmost + 2, model.length)
+        self.generations[lo:hi] = [0] * (hi - lo)
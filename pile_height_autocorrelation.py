@@ -0,0 +1,65 @@
+# Python 3.10.6
+# =========================================================
+# Generate the pile height autocorrelation and power spectrum plot
+# =========================================================
+
+from utils import figures_folder
+from generate_heights import get_heights_data
+from time_series import autocorrelation, autocorrelation_time, power_spectrum
+import matplotlib.pyplot as plt
+import numpy as np
+
+# =========================================================
+# get data
+# =========================================================
+lengths, height_sequence_list = get_heights_data()
+
+# =========================================================
+# time series analysis
+# =========================================================
+autocorrelations = []
+spectra = []
+taus = []
+for i in range(len(lengths)):
+    # correlations die off on the scale of L cycles, tau ~ 0.5 - 1 L, so 20 L
+    # lags is plenty to estimate tau, then only 10 tau are kept to plot
+    max_lag = min(20 * lengths[i], len(height_sequence_list[i]) - 1)
+    rho = autocorrelation(height_sequence_list[i], max_lag)
+    taus.append(autocorrelation_time(rho))
+    autocorrelations.append(rho[:int(np.ceil(10 * taus[-1])) + 1])
+    spectra.append(power_spectrum(height_sequence_list[i], 2**14))
+print("Lengths:", lengths)
+print("Integrated autocorrelation times:", taus)
+
+# =========================================================
+# plotting
+# =========================================================
+fig = plt.figure(figsize=(6.5, 3), layout="constrained")
+
+# autocorrelation against scaled time
+ax1 = fig.add_subplot(121)
+for i in reversed(range(len(lengths))):
+    lags = np.arange(len(autocorrelations[i]))
+    ax1.plot(lags / lengths[i], autocorrelations[i], label=str(lengths[i]),
+             color="C%i" % (len(lengths) - i - 1), linewidth=1)
+ax1.set_xlabel(r"$t \, / \, L$")
+ax1.set_ylabel(r"$\rho_h(t)$")
+ax1.set_xlim(0, 5)
+ax1.set_title("(A)")
+
+# power spectrum
+ax2 = fig.add_subplot(122)
+for i in reversed(range(len(lengths))):
+    frequencies, power = spectra[i]
+    ax2.plot(frequencies[1:], power[1:], label=str(lengths[i]),
+             color="C%i" % (len(lengths) - i - 1), linewidth=1)
+ax2.legend(bbox_to_anchor=(1.05, 1), loc='upper left',
+           borderaxespad=0., title="Size, $L$")
+ax2.set_xlabel("Frequency, $f$")
+ax2.set_ylabel(r"$S_h(f)$")
+ax2.set_xscale("log")
+ax2.set_yscale("log")
+ax2.set_title("(B)")
+
+plt.savefig(figures_folder + 'height_autocorrelation.svg',
+            format='svg', bbox_inches='tight')
@@ -3,7 +3,10 @@
 # Generate the corrections to scaling plot
 # =========================================================
 
-from generate_heights import get_heights_data
+from generate_heights import get_heights_data, get_height_statistics
+from error_analysis import block_means, block_bootstrap
+from scaling_functions import corrections_to_scaling, corrections_to_scaling_jacobian, \
+    full_scaling
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.optimize import curve_fit
@@ -12,33 +15,42 @@ from utils import figures_folder
 # =========================================================
 # get data
 # =========================================================
-lengths, height_sequence_list = get_heights_data()
+lengths, accumulators = get_height_statistics()
 
 average_height_list = []
 average_height_errors = []
-for l in height_sequence_list:
-    average_height_list.append(np.average(l))
-    average_height_errors.append(np.std(l)/np.sqrt(len(l)))
+for accumulator in accumulators:
+    average_height_list.append(accumulator.get_mean())
+    # by blocking, since successive heights are strongly correlated
+    average_height_errors.append(accumulator.get_mean_error())
 print("Lengths:", lengths)
 print("Errors:", average_height_errors)
 
 # =========================================================
 # fitting
 # =========================================================
+scaled_values = [average_height_list[i] / lengths[i]
+                 for i in range(len(lengths))]
 
+popt, pcov = curve_fit(corrections_to_scaling, lengths, scaled_values,
+                       jac=corrections_to_scaling_jacobian)
 
-def corrections_to_scaling_func(L, a0, a1, o1):
-    return a0 * (1 - a1 * L ** (-o1))
-
-
-def full_scaling_func(L, a0, a1, o1):
-    return a0 * L * (1 - a1 * L ** (-o1))
 
+def bootstrap_fit(resampled):
+    """
+    Refit to one block bootstrap resample of the average heights.
+    """
+    values = [resampled[i][0] / lengths[i] for i in range(len(lengths))]
+    return curve_fit(corrections_to_scaling, lengths, values, p0=popt,
+                     jac=corrections_to_scaling_jacobian)[0]
 
-scaled_values = [average_height_list[i] / lengths[i]
-                 for i in range(len(lengths))]
 
-popt, pcov = curve_fit(corrections_to_scaling_func, lengths, scaled_values)
+# errors on the fit parameters by block bootstrap of the height series
+_, height_sequence_list = get_heights_data()
+bootstrap = block_bootstrap(bootstrap_fit, [
+    block_means(height_sequence_list[i], accumulators[i].blocking.get_block_length())
+    for i in range(len(lengths))])
+popt_errors = np.std(bootstrap, axis=0)
 x_min, x_max = 0.1, 600
 x_vals = np.linspace(x_min, x_max, 100)
 
@@ -51,7 +63,7 @@ fig = plt.figure(figsize=(6.5, 3), layout="constrained")
 ax1 = fig.add_subplot(121)
 ax1.scatter(lengths, average_height_list, s=50, marker="+",  # type: ignore
             c="k", label="Data")  # type: ignore
-ax1.plot(x_vals, full_scaling_func(x_vals, *popt), color='lightgrey',
+ax1.plot(x_vals, full_scaling(x_vals, *popt), color='lightgrey',
          linestyle='dashed', label='Full Fit', zorder=-1)
 ax1.legend(loc='lower right')
 ax1.set_xlabel("System Length, $L$")
@@ -59,14 +71,14 @@ ax1.set_ylabel(r"$\langle h \rangle_t$")
 x1, _ = ax1.get_xlim()
 y1, _ = ax1.get_ylim()
 ax1.set_xlim(x1, x_max)
-ax1.set_ylim(y1, full_scaling_func(x_max, *popt))
+ax1.set_ylim(y1, full_scaling(x_max, *popt))
 ax1.set_title("(A)")
 
 # right
 ax2 = fig.add_subplot(122)
 ax2.scatter(lengths, scaled_values, s=50, marker="+",  # type: ignore
             c="k", label="Data")
-ax2.plot(x_vals, corrections_to_scaling_func(x_vals, *popt),
+ax2.plot(x_vals, corrections_to_scaling(x_vals, *popt),
          label="Cor. to Scaling Fit", color="lightgrey", linestyle='dashed', zorder=-1)
 x1, _ = ax2.get_xlim()
 ax2.hlines(popt[0], x1, x_max, color='k',
@@ -75,7 +87,7 @@ ax2.set_xlim(x1, x_max)
 ax2.set_ylim(1.55, 1.75)
 ax2.set_yticks([1.55, 1.60, 1.65, 1.70, 1.75])
 print("Fit: a0 = %.3f +/- %.3f, a1 = %.3f +/- %.3f, o1 = %.3f +/- %.3f" %
-      (popt[0], np.sqrt(pcov[0, 0]), popt[1], np.sqrt(pcov[1, 1]), popt[2], np.sqrt(pcov[2, 2])))
+      (popt[0], popt_errors[0], popt[1], popt_errors[1], popt[2], popt_errors[2]))
 ax2.legend()
 ax2.set_xlabel("System Length, $L$")
 ax2.set_ylabel(r"$\langle h \rangle_t \,\, / \,\, L$")
@@ -3,9 +3,8 @@
 # Generate the inter-site correlations plot
 # =========================================================
 
-from model import Model
+from spatial_correlations import harvest_snapshots, correlation_function
 import numpy as np
-import pickle
 import matplotlib.pyplot as plt
 from utils import data_folder, figures_folder
 
@@ -13,73 +12,34 @@ from utils import data_folder, figures_folder
 # parameters
 # =========================================================
 length = 512
-repetitions = 20
+num_snapshots = 500
 min_sep, max_sep = 1, 20
-filename = 'correlation_gradients.pickle'
+filename = 'correlation_gradients.npy'
 
 # =========================================================
 # get data
 # =========================================================
-gradients: list[list[int]] = []
 # if saved data, use that, else generate new data
 try:
     # attempt to load the data file
-    with open(data_folder + filename, "rb") as f:
-        gradients = pickle.load(f)
+    gradients = np.load(data_folder + filename)
 except:
     # generate the data
-    for rep in range(repetitions):
-        # initiate model
-        model = Model(length)
-        # run model
-        # maximum number of grains in steady state is 1/2 * L * 2L = L^2
-        for _ in range(length**2):
-            model.cycle()
-        # get gradients
-        gradients.append(model.get_gradients())
-        # log progress, since this takes a while
-        print("Rep", rep + 1, "of", repetitions, "complete")
+    # decorrelated snapshots of the gradients, all from one steady state run,
+    # rather than one warm-up for each
+    gradients = harvest_snapshots(length, num_snapshots)
 
     # saving
-    with open(data_folder + filename, "wb") as f:
-        pickle.dump(gradients, f)
-
+    np.save(data_folder + filename, gradients)
 
 # =========================================================
 # calculate correlations
 # =========================================================
-# setup the list of separations we want to measure
-separations: list[int] = []
-for i in range(min_sep, max_sep + 1):
-    separations.append(i)
-
-# setup a way to save the values of the correlations
-correlations = {}
-for s in separations:
-    correlations[s] = []
-
-# repeat calculations for each repetition
-for rep in range(len(gradients)):
-    single_grad_list = gradients[rep]
-
-    # measure the correlations
-    for s in separations:
-        # create the two arrays to correlate
-        y = single_grad_list[0:len(single_grad_list)-s]
-        x = single_grad_list[s:len(single_grad_list)]
-        # find the correlation coefficient between them
-        corr = np.corrcoef(x, y)[0][1]
-        # save the correlation
-        correlations[s].append(corr)
-
-correlation_means = []
-errors = []
-
-# extract the mean and std error
-for s in separations:
-    correlation_means.append(np.mean(correlations[s]))
-    errors.append(np.std(correlations[s]))
-
+# every separation at once, averaged over the snapshots, with standard errors
+separations, correlation_means, errors = correlation_function(gradients, max_sep)
+separations = separations[min_sep - 1:].tolist()
+correlation_means = correlation_means[min_sep - 1:]
+errors = errors[min_sep - 1:]
 
 # =========================================================
 # plotting
@@ -9,6 +9,7 @@ from model import Model
 import pickle
 import matplotlib.pyplot as plt
 from scipy.optimize import curve_fit
+from scaling_functions import squared, squared_jacobian
 
 # =========================================================
 # parameters
@@ -58,18 +59,11 @@ print("Errors:", errors)
 # =========================================================
 # fitting
 # =========================================================
-
-
-# the function we want to fit
-def squared_func(x, a):
-    return a*x**2
-
-
 # fit the function
-popt, pcov = curve_fit(squared_func, lengths, cross_over_times)
+popt, pcov = curve_fit(squared, lengths, cross_over_times, jac=squared_jacobian)
 # generate the x and y values for plotting
 fit_x_vals = np.linspace(3.5, 600, 1000)
-fit_y_vals = squared_func(fit_x_vals, *popt)
+fit_y_vals = squared(fit_x_vals, *popt)
 # output the final parameters
 print("Fit: (%.5f +/- %.5f) * x^2" % (popt[0], np.sqrt(pcov[0])))
 
@@ -4,10 +4,12 @@
 # =========================================================
 
 from mpl_toolkits.axes_grid1.inset_locator import zoomed_inset_axes, mark_inset
-from utils import data_folder, figures_folder, average_different_lengths
+from utils import data_folder, figures_folder
 from scipy.optimize import curve_fit
+from scaling_functions import transient_plateau, transient_plateau_jacobian
 import matplotlib.pyplot as plt
 from model import Model
+from checkpoint import save_checkpoint, load_checkpoint, remove_checkpoint
 import numpy as np
 import pickle
 
@@ -17,60 +19,71 @@ import pickle
 lengths = [4, 8, 16, 32, 64, 128, 256, 512]
 repetitions = 20
 filename = 'average_heights_with_time.pickle'
+checkpoint_filename = 'average_heights_with_time.checkpoint'
+# cycles between checkpoints
+checkpoint_interval = 65536
 
 # =========================================================
 # get data
 # =========================================================
-average_heights_with_time: list[list[int]] = []
+average_heights_with_time: list[list[float]] = []
 # if saved data, use that, else generate new data
 try:
     # attempt to load the data file
     with open(data_folder + filename, "rb") as f:
         average_heights_with_time = pickle.load(f)
 except:
-    # generate the data
-    for length in lengths:
-        height_lists: list[list[int]] = []
-        for _ in range(repetitions):
-            model = Model(length)
-            height_values: list[int] = []
-            # run for 1.5 * max cross over time
-            for _ in range(int(1.5*length**2)):
+    # resume from the last checkpoint, if there is one
+    checkpoint = load_checkpoint(data_folder + checkpoint_filename)
+    if checkpoint is not None:
+        average_heights_with_time = checkpoint["average_heights_with_time"]
+
+    def save(total_heights, rep: int, model: Model | None, height_values: list[int]) -> None:
+        save_checkpoint(data_folder + checkpoint_filename, {
+            "average_heights_with_time": average_heights_with_time,
+            "total_heights": total_heights, "rep": rep,
+            "model": None if model is None else model.get_state(),
+            "height_values": height_values})
+
+    # generate the data, skipping lengths which are already complete
+    for length in lengths[len(average_heights_with_time):]:
+        # run for 1.5 * max cross over time
+        num_cycles = int(1.5*length**2)
+        if checkpoint is not None and checkpoint["total_heights"] is not None:
+            total_heights = checkpoint["total_heights"]
+            first_rep = checkpoint["rep"]
+        else:
+            total_heights = np.zeros(num_cycles)
+            first_rep = 0
+        for rep in range(first_rep, repetitions):
+            if checkpoint is not None and checkpoint["model"] is not None:
+                model = Model.from_state(checkpoint["model"])
+                height_values: list[int] = checkpoint["height_values"]
+            else:
+                model = Model(length)
+                height_values: list[int] = []
+            checkpoint = None
+            for t in range(len(height_values), num_cycles):
                 model.cycle()
                 height_values.append(model.get_pile_height())
-            height_lists.append(height_values)
-        average_heights_with_time.append(
-            average_different_lengths(height_lists))
+                if (t + 1) % checkpoint_interval == 0:
+                    save(total_heights, rep, model, height_values)
+            total_heights += height_values
+            save(total_heights, rep + 1, None, [])
+        average_heights_with_time.append((total_heights / repetitions).tolist())
+        save(None, 0, None, [])
         # log progress, since this takes a while
         print("Length", length, "complete")
 
     # save the data
     with open(data_folder + filename, "wb") as f:
         pickle.dump(average_heights_with_time, f)
+    remove_checkpoint(data_folder + checkpoint_filename)
 
 # =========================================================
 # data collapse
 # =========================================================
 
-
-# fit the proposed scaling function
-def scaling_func(x, g):
-    try:
-        x[0]
-        results = []
-        for x_i in x:
-            if x_i < 0.5*g:
-                results.append((2*g*x_i) ** 0.5)
-            else:
-                results.append(g)
-        return results
-    except:
-        if x < 0.5*g:
-            return (2*g*x) ** 0.5
-        else:
-            return g
-
-
 # generate values for fitting
 y_vals = [np.array(i) for i in average_heights_with_time]
 x_vals = [np.array(range(len(average_heights_with_time[i])))/(lengths[i]**2)
@@ -80,10 +93,11 @@ x_vals = [np.array(range(len(average_heights_with_time[i])))/(lengths[i]**2)
 for i in range(len(y_vals)):
     y_vals[i] = y_vals[i] / lengths[i]
 
-# fitting
-popt, pcov = curve_fit(scaling_func, x_vals[-1], y_vals[-1])
+# fit the proposed scaling function
+popt, pcov = curve_fit(transient_plateau, x_vals[-1], y_vals[-1],
+                       jac=transient_plateau_jacobian)
 fit_x_vals = np.linspace(0.00001, 1.5, 100000)
-fit_y_vals = scaling_func(fit_x_vals, *popt)
+fit_y_vals = transient_plateau(fit_x_vals, *popt)
 print("Fit: g = %.3f" % popt[0])
 
 # =========================================================
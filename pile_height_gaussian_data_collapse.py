@@ -4,7 +4,8 @@
 # =========================================================
 
 from utils import figures_folder
-from generate_heights import get_heights_data
+from generate_heights import get_height_statistics
+from height_distributions import collapse_all, gaussian
 import matplotlib.pyplot as plt
 import numpy as np
 from scipy.stats import skew
@@ -12,17 +13,14 @@ from scipy.stats import skew
 # =========================================================
 # get data
 # =========================================================
-lengths, height_sequence_list = get_heights_data()
+lengths, accumulators = get_height_statistics()
+
+# standardised distributions, and deviations from the gaussian, of each length
+collapses = collapse_all([accumulator.get_histogram() for accumulator in accumulators])
 
 # =========================================================
 # plotting
 # =========================================================
-
-
-def collapse_func(x):
-    return (1 / np.sqrt(2*np.pi)) * np.exp(-0.5*x**2)
-
-
 # x values to plot the fitted function against
 x_min, x_max = -7, 7
 x_vals = np.linspace(x_min, x_max, 100)
@@ -32,17 +30,10 @@ fig = plt.figure(figsize=(6.5, 3), layout="constrained")
 # linear plot
 ax1 = fig.add_subplot(121)
 for i in reversed(range(len(lengths))):
-    data = height_sequence_list[i]
-    average = np.average(data)
-    std = np.std(data)
-    n, bins, patches = plt.hist(data, max(data) - min(data) + 1, density=True,
-                                range=(min(data)-0.5, max(data)+0.5), alpha=0)
-    bin_means = [0.5 * (bins[i] + bins[i+1]) for i in range(len(n))]
-    scaled_n = np.array(n)*std
-    scaled_bin_means = [(bin_mean - average)/std for bin_mean in bin_means]
+    scaled_bin_means, scaled_n, _ = collapses[i]
     ax1.scatter(scaled_bin_means, scaled_n, s=20, color="C%i" % (
         len(lengths) - i - 1), label="$L=$%i" % lengths[i], marker="x")  # type: ignore
-ax1.plot(x_vals, collapse_func(x_vals), color='k',
+ax1.plot(x_vals, gaussian(x_vals), color='k',
          label='CLT', linestyle='dashed')
 ax1.set_xlabel(r"$\frac{h - \langle h \rangle}{\sigma_h}$")
 ax1.set_ylabel(r"$\sigma_h \,\, P \, (h;L)$")
@@ -53,23 +44,11 @@ ax1.set_title("(A)")
 ax2 = fig.add_subplot(122)
 values_for_skewness = []
 for i in reversed(range(len(lengths))):
-    data = height_sequence_list[i]
-    average = np.average(data)
-    std = np.std(data)
-    n, bins, patches = plt.hist(data, max(data) - min(data) + 1, density=True,
-                                range=(min(data)-0.5, max(data)+0.5), alpha=0)
-    bin_means = [0.5 * (bins[i] + bins[i+1]) for i in range(len(n))]
-    scaled_n = np.array(n)*std
-    scaled_bin_means = [(bin_mean - average)/std for bin_mean in bin_means]
-    diff_n = []
-    # subtracting the expected values
-    for index in range(len(scaled_n)):
-        diff_n.append(
-            (scaled_n[index] / collapse_func(scaled_bin_means[index]))-1)
+    scaled_bin_means, _, diff_n = collapses[i]
     ax2.scatter(scaled_bin_means, diff_n, s=20, color="C%i" % (
         len(lengths) - i - 1), label="$L=$%i" % lengths[i], marker="x")  # type: ignore
     # add the x values to the overall list for skewness calculation
-    values_for_skewness += scaled_bin_means
+    values_for_skewness += scaled_bin_means.tolist()
 # calculate skewness
 total_skew = skew(values_for_skewness)
 print("Skew:", total_skew)
@@ -4,13 +4,16 @@
 # =========================================================
 
 from utils import figures_folder
-from generate_heights import get_heights_data
+from generate_heights import get_height_statistics
+from height_distributions import distribution
 import matplotlib.pyplot as plt
 
 # =========================================================
 # get data
 # =========================================================
-lengths, height_sequence_list = get_heights_data()
+lengths, accumulators = get_height_statistics()
+distributions = [distribution(accumulator.get_histogram())
+                 for accumulator in accumulators]
 
 # =========================================================
 # plotting
@@ -19,11 +22,10 @@ fig = plt.figure(figsize=(6.5, 3), layout="constrained")
 
 ax1 = fig.add_subplot(111)
 for i in reversed(range(len(lengths))):
-    data = height_sequence_list[i]
-    n, bins, patches = plt.hist(data, max(data) - min(data) + 1, density=True,
-                                range=(min(data)-0.5, max(data)+0.5), alpha=0.1)
-    bin_means = [0.5 * (bins[i] + bins[i+1]) for i in range(len(n))]
-    ax1.plot(bin_means, n, color="C%i" %
+    heights, probabilities = distributions[i]
+    ax1.bar(heights, probabilities, width=1, alpha=0.1, color="C%i" %
+            (len(lengths) - i - 1))
+    ax1.plot(heights, probabilities, color="C%i" %
              (len(lengths) - i - 1), label=lengths[i])
 ax1.legend(bbox_to_anchor=(1.05, 1), loc='upper left',
            borderaxespad=0., title="Size, $L$")
@@ -4,7 +4,9 @@
 # =========================================================
 
 from utils import figures_folder
-from generate_heights import get_heights_data
+from generate_heights import get_heights_data, get_height_statistics
+from error_analysis import block_means, block_bootstrap
+from scaling_functions import power_law, power_law_jacobian
 import matplotlib.pyplot as plt
 from scipy.optimize import curve_fit
 import numpy as np
@@ -12,39 +14,38 @@ import numpy as np
 # =========================================================
 # get data
 # =========================================================
-lengths, height_sequence_list = get_heights_data()
-std_values = [np.std(data) for data in height_sequence_list]
+lengths, accumulators = get_height_statistics()
+std_values = [accumulator.get_std() for accumulator in accumulators]
 
+# =========================================================
+# fitting
+# =========================================================
+popt, pcov = curve_fit(power_law, lengths, std_values, jac=power_law_jacobian)
+x_vals = np.linspace(4, 600, 100)
 
-def std_error(std, n):
+
+def bootstrap_fit(resampled):
     """
-    Return the error on the std
+    Refit to one block bootstrap resample, returning the fit parameters
+    followed by the resampled standard deviations.
     """
-    return std / np.sqrt(2*n - 2)
+    stds = [np.sqrt(max(m[1] - m[0]**2, 0)) for m in resampled]
+    return list(curve_fit(power_law, lengths, stds, p0=popt,
+                          jac=power_law_jacobian)[0]) + stds
 
 
-errors = []
-for i in range(len(height_sequence_list)):
-    n = len(height_sequence_list[i])
-    std = std_values[i]
-    errors.append(std_error(std, n))
+# errors by block bootstrap, since successive heights are strongly correlated
+_, height_sequence_list = get_heights_data()
+bootstrap = block_bootstrap(bootstrap_fit, [
+    block_means(height_sequence_list[i], accumulators[i].blocking.get_block_length(), 2)
+    for i in range(len(lengths))])
+bootstrap_errors = np.std(bootstrap, axis=0)
+errors = bootstrap_errors[2:]
 
 print("Lengths:", lengths)
 print("Errors:", errors)
-
-# =========================================================
-# fitting
-# =========================================================
-
-
-def std_cts_func(L, a0, o1):
-    return a0 * L ** o1
-
-
-popt, pcov = curve_fit(std_cts_func, lengths, std_values)
-x_vals = np.linspace(4, 600, 100)
 print("Fit: a0 = %.4f, o1 = %.4f +/- %.4f" %
-      (popt[0], popt[1], np.sqrt(pcov[1, 1])))
+      (popt[0], popt[1], bootstrap_errors[1]))
 
 # =========================================================
 # plotting
@@ -55,7 +56,7 @@ fig = plt.figure(figsize=(6.5, 3), layout="constrained")
 ax1 = fig.add_subplot(121)
 ax1.scatter(lengths, std_values, s=50,
             marker="+", c="k", label="Data")  # type: ignore
-ax1.plot(x_vals, std_cts_func(x_vals, *popt), label=r"Fit",
+ax1.plot(x_vals, power_law(x_vals, *popt), label=r"Fit",
          color='lightgrey', linestyle='dashed', zorder=-1)
 ax1.set_xlabel("System Length, $L$")
 ax1.set_ylabel(r"Standard Deviation, $\sigma_h$")
@@ -65,7 +66,7 @@ ax1.set_title("(A)")
 ax2 = fig.add_subplot(122)
 ax2.scatter(lengths, std_values, s=50,
             marker="+", c="k", label="Data")  # type: ignore
-ax2.plot(x_vals, std_cts_func(x_vals, *popt), label="Fit",
+ax2.plot(x_vals, power_law(x_vals, *popt), label="Fit",
          color='lightgrey', linestyle='dashed', zorder=-1)
 ax2.legend(bbox_to_anchor=(1.05, 1), loc='upper left', borderaxespad=0.)
 ax2.set_xlabel("System Length, $L$")
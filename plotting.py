@@ -0,0 +1,31 @@
+# Python 3.10.6
+# =========================================================
+# Plotting, kept apart from the model so it loads only when needed
+# =========================================================
+
+import numpy as np
+import matplotlib.pyplot as plt
+from utils import figures_folder
+
+
+def plot_model(model, save_as: str = "plot.svg") -> None:
+    """
+    Plot the current state of `model` and save it to an svg.
+    """
+    # get the current state of the system
+    heights = model.get_all_heights()
+    # construct a figure
+    fig = plt.figure(figsize=(3, 6))
+    ax = fig.add_subplot(111)
+    # plot the heights as a bar chart
+    ax.bar(np.array(range(model.length)) + 1,
+           heights, width=0.95, color='grey')
+    ax.axis('scaled')
+    ax.set_ylabel("Height")
+    ax.set_xlabel("Site, $i$")
+    if len(heights) <= 8:
+        ax.set_yticks(range(max(heights) + 1))
+        ax.set_xticks(np.array(range(model.length)) + 1)
+        ax.grid(axis='y')
+    plt.savefig(figures_folder + save_as,
+                format='svg', bbox_inches='tight')
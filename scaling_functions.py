@@ -0,0 +1,87 @@
+# Python 3.10.6
+# =========================================================
+# Vectorised functions to fit, with their Jacobians
+# =========================================================
+
+import numpy as np
+
+# each function `f(x, *params)` works on scalars and arrays alike, and has a
+# `f_jacobian(x, *params)`, the derivatives by each parameter as an array
+# of shape (len(x), len(params)), to pass to curve_fit as `jac`
+
+
+def transient_plateau(x, g):
+    """
+    Scaled pile height against scaled time, x = t / L^2, which grows as
+    sqrt(2 g x) during the transient, then stays at g.
+    """
+    x = np.asarray(x, dtype=float)
+    return np.where(x < 0.5 * g, np.sqrt(2 * g * np.maximum(x, 0)), g)
+
+
+def transient_plateau_jacobian(x, g):
+    x = np.asarray(x, dtype=float)
+    return np.where(x < 0.5 * g, np.sqrt(np.maximum(x, 0) / (2 * g)), 1.0)[:, None]
+
+
+def power_law(x, a0, a1):
+    """
+    a0 * x^a1
+    """
+    return a0 * np.asarray(x, dtype=float) ** a1
+
+
+def power_law_jacobian(x, a0, a1):
+    x = np.asarray(x, dtype=float)
+    power = x ** a1
+    return np.stack([power, a0 * power * np.log(x)], axis=-1)
+
+
+def linear(x, a, b):
+    """
+    a + b * x
+    """
+    return a + b * np.asarray(x, dtype=float)
+
+
+def linear_jacobian(x, a, b):
+    x = np.asarray(x, dtype=float)
+    return np.stack([np.ones_like(x), x], axis=-1)
+
+
+def squared(x, a):
+    """
+    a * x^2
+    """
+    return a * np.asarray(x, dtype=float) ** 2
+
+
+def squared_jacobian(x, a):
+    return (np.asarray(x, dtype=float) ** 2)[:, None]
+
+
+def corrections_to_scaling(L, a0, a1, o1):
+    """
+    Average pile height over L, a0 * (1 - a1 * L^-o1), with a0 the
+    asymptote and o1 the exponent of the first correction to scaling.
+    """
+    return a0 * (1 - a1 * np.asarray(L, dtype=float) ** (-o1))
+
+
+def corrections_to_scaling_jacobian(L, a0, a1, o1):
+    L = np.asarray(L, dtype=float)
+    correction = L ** (-o1)
+    return np.stack([1 - a1 * correction, -a0 * correction,
+                     a0 * a1 * correction * np.log(L)], axis=-1)
+
+
+def full_scaling(L, a0, a1, o1):
+    """
+    Average pile height, a0 * L * (1 - a1 * L^-o1).
+    """
+    return np.asarray(L, dtype=float) * corrections_to_scaling(L, a0, a1, o1)
+
+
+def full_scaling_jacobian(L, a0, a1, o1):
+    L = np.asarray(L, dtype=float)
+    return L[:, None] * corrections_to_scaling_jacobian(L, a0, a1, o1)
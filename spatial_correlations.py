@@ -0,0 +1,99 @@
+# Python 3.10.6
+# =========================================================
+# Correlations between the gradients of different sites
+# =========================================================
+
+import numpy as np
+from steady_states import steady_state_model
+from time_series import integrated_autocorrelation_time
+from error_analysis import blocking_error
+
+
+def snapshot_interval(model, pilot_cycles: int | None = None) -> int:
+    """
+    Cycles between roughly independent snapshots of a steady state `model`,
+    twice the longer integrated autocorrelation time, over a pilot run of
+    `pilot_cycles`, default L^2, of the pile height and of the gradient at
+    the last site, which is the slowest of all sites to decorrelate.
+    """
+    if pilot_cycles is None:
+        pilot_cycles = max(model.length**2, 1000)
+    last = model.length - 1
+    heights, last_gradients = [], []
+    for _ in range(pilot_cycles):
+        model.cycle()
+        heights.append(model.get_pile_height())
+        last_gradients.append(model.gradients[last])
+    tau = max(integrated_autocorrelation_time(heights),
+              integrated_autocorrelation_time(last_gradients))
+    return max(1, int(np.ceil(2 * tau)))
+
+
+def harvest_snapshots(length: int, count: int, interval: int | None = None,
+                      p: float = 0.5, seed=None) -> np.ndarray:
+    """
+    The gradients of `count` steady state configurations of one system,
+    `interval` cycles apart, default from `snapshot_interval`, as a
+    (count, length) uint8 array. The system starts from a stored steady
+    state, so only one warm-up is ever needed, however many snapshots.
+    """
+    model = steady_state_model(length, p, seed)
+    if interval is None:
+        interval = snapshot_interval(model)
+    snapshots = np.empty((count, length), dtype=np.uint8)
+    for n in range(count):
+        for _ in range(interval):
+            model.cycle()
+        snapshots[n] = model.gradients
+    return snapshots
+
+
+def lagged_sums(x: np.ndarray) -> np.ndarray:
+    """
+    sum over i of x[:, i] * x[:, i + s], for every separation s, for each
+    row of `x` at once, by FFT.
+    """
+    length = x.shape[1]
+    size = 2 ** int(np.ceil(np.log2(2 * length)))
+    transform = np.fft.rfft(x, size, axis=1)
+    return np.fft.irfft(transform * np.conj(transform), size, axis=1)[:, :length]
+
+
+def correlations(snapshots, max_separation: int | None = None) -> np.ndarray:
+    """
+    The Pearson correlation between the gradients of sites s apart, as from
+    `np.corrcoef(g[s:], g[:-s])`, for each separation s from 1 to
+    `max_separation`, default L / 2, for every snapshot at once.
+    Returns a (snapshots, separations) array.
+    """
+    x = np.asarray(snapshots, dtype=float)
+    length = x.shape[1]
+    if max_separation is None:
+        max_separation = length // 2
+    separations = np.arange(1, max_separation + 1)
+    # sums over the first and last L - s sites, for every s, from prefix sums
+    zero = np.zeros((len(x), 1))
+    prefix = np.concatenate([zero, np.cumsum(x, axis=1)], axis=1)
+    prefix_squares = np.concatenate([zero, np.cumsum(x**2, axis=1)], axis=1)
+    n = length - separations
+    head, tail = prefix[:, n], prefix[:, [length]] - prefix[:, separations]
+    head_squares = prefix_squares[:, n]
+    tail_squares = prefix_squares[:, [length]] - prefix_squares[:, separations]
+    products = lagged_sums(x)[:, separations]
+    covariance = products / n - head * tail / n**2
+    variances = (head_squares / n - (head / n)**2) * (tail_squares / n - (tail / n)**2)
+    return covariance / np.sqrt(variances)
+
+
+def correlation_function(snapshots, max_separation: int | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (separations, means, errors), the correlation between gradients
+    at each separation averaged over every snapshot, with its standard error.
+    The snapshots are taken in sequence, as from `harvest_snapshots`, so the
+    errors are found by blocking, in case neighbouring snapshots are still
+    correlated.
+    """
+    values = correlations(snapshots, max_separation)
+    separations = np.arange(1, values.shape[1] + 1)
+    errors = np.array([blocking_error(values[:, s]) for s in range(values.shape[1])])
+    return (separations, np.mean(values, axis=0), errors)
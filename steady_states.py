@@ -0,0 +1,124 @@
+# Python 3.10.6
+# =========================================================
+# A store of steady state configurations, to skip warm-up
+# =========================================================
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import numpy as np
+from equilibration import equilibrate
+from model import Model, spawn_seeds
+from utils import data_folder
+from dataset import seed_metadata
+
+# folder for the stored configurations
+steady_states_folder = data_folder + 'steady_states/'
+
+
+def steady_state_path(length: int, p: float, seed: np.random.SeedSequence) -> str:
+    """
+    Path of the stored steady state generated from `seed` for the given
+    length and p. The seed is part of the name, so the same seed always
+    gives the same configuration, whichever script stored it first.
+    """
+    key = hashlib.sha256(json.dumps(seed_metadata(seed)).encode()).hexdigest()[:16]
+    return steady_states_folder + "L%i_p%s_%s.pickle" % (length, p, key)
+
+
+def configuration(length: int, p: float, gradients, thresholds, pile_height: int) -> dict:
+    """
+    A steady state configuration, in the form taken by `Model.from_state`.
+    It has no random generator state, so every model made from it
+    starts its own fresh random stream.
+    """
+    return {
+        "length": length,
+        "p": p,
+        "gradients": bytes(gradients),
+        "thresholds": bytes(thresholds),
+        "pile_height": int(pile_height),
+        "is_transient": False,
+    }
+
+
+def generate_steady_states(length: int, p: float, count: int, seed=None) -> list[dict]:
+    """
+    Generate `count` independent steady state configurations, each from
+    its own stream spawned from `seed`. Each system is run until its pile
+    height has stopped drifting, rather than for a fixed number of cycles.
+    """
+    states: list[dict] = []
+    for model_seed in spawn_seeds(seed, count):
+        model = Model(length, p, model_seed)
+        equilibrate(model)
+        states.append(configuration(length, p, model.gradients, model.thresholds,
+                                    model.get_pile_height()))
+    return states
+
+
+def configuration_hash(gradients, thresholds) -> str:
+    """
+    A short hash of a configuration, to identify which one a run started from.
+    """
+    return hashlib.sha256(bytes(gradients) + bytes(thresholds)).hexdigest()[:16]
+
+
+def get_steady_state(length: int, p: float = 0.5, seed=None) -> dict:
+    """
+    Get the steady state configuration for the given length and p generated
+    from `seed`, an int or `np.random.SeedSequence`. If it hasn't been
+    stored yet, it is generated and stored for next time. Given no seed,
+    the configuration could never be asked for again, so isn't stored.
+    """
+    if seed is None:
+        return generate_steady_states(length, p, 1)[0]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    path = steady_state_path(length, p, seed)
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    state = generate_steady_states(length, p, 1, seed)[0]
+    os.makedirs(steady_states_folder, exist_ok=True)
+    # write to a file of this process's own, then link it into place,
+    # which fails rather than replacing a configuration already stored
+    descriptor, temporary_path = tempfile.mkstemp(dir=steady_states_folder, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            pickle.dump(state, f)
+        os.link(temporary_path, path)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+    finally:
+        os.remove(temporary_path)
+    return state
+
+
+def get_steady_states(length: int, p: float = 0.5, count: int = 1, seed=None) -> list[dict]:
+    """
+    Get `count` steady state configurations for the given length and p,
+    each from its own stream spawned from `seed`, generating any missing.
+    """
+    return [get_steady_state(length, p, state_seed)
+            for state_seed in spawn_seeds(seed, count)]
+
+
+def steady_state_model(length: int, p: float = 0.5, seed=None) -> Model:
+    """
+    A model starting from a steady state for the given length and p, with a
+    fresh random stream from `seed`, an int, `np.random.SeedSequence` or None.
+    The steady state is generated from a separate stream spawned from `seed`,
+    and stored, so the same seed always starts from the same configuration,
+    and parallel workers, each with their own seed, store their own.
+    """
+    generation_seed, model_seed = spawn_seeds(seed, 2)
+    if seed is None:
+        generation_seed = None
+    state = get_steady_state(length, p, generation_seed)
+    return Model.from_state(state, model_seed)
@@ -0,0 +1,63 @@
+# Python 3.10.6
+# =========================================================
+# Run simulations for many system lengths across processes
+# =========================================================
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import os
+from model import spawn_seeds
+
+
+def get_context():
+    """
+    The scripts in this repo run at import time, so workers are forked
+    where possible rather than spawned, which would import them again.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def run_sweep(task, lengths: list[int], repetitions: int = 1, seed=None,
+              workers: int | None = None, args: tuple = ()) -> list[list]:
+    """
+    Run `task(length, repetition, seed, *args)` once for each repetition of
+    each length and return the results as `results[length_index][repetition]`.
+    Every task gets its own seed sequence spawned from `seed`, fixed by its
+    position in the sweep, so results don't depend on scheduling.
+    Tasks are spread over `workers` processes, default all cores, with the
+    longest lengths started first since they take by far the longest.
+    `task` must be a module level function, so it can be sent to workers.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    seeds = spawn_seeds(seed, len(lengths) * repetitions)
+    tasks = [(l, r) for l in range(len(lengths)) for r in range(repetitions)]
+    results: list[list] = [[None] * repetitions for _ in lengths]
+    remaining = [repetitions] * len(lengths)
+
+    def store(l: int, r: int, result) -> None:
+        results[l][r] = result
+        remaining[l] -= 1
+        # log progress, since this takes a while
+        if remaining[l] == 0:
+            print(lengths[l], 'complete')
+
+    if workers == 1:
+        # no need for a pool, which also makes debugging easier
+        for l, r in tasks:
+            store(l, r, task(lengths[l], r, seeds[l * repetitions + r], *args))
+        return results
+
+    # longest jobs first, so the short ones fill in the gaps at the end
+    tasks.sort(key=lambda t: lengths[t[0]], reverse=True)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context()) as pool:
+        futures = {
+            pool.submit(task, lengths[l], r, seeds[l * repetitions + r], *args): (l, r)
+            for l, r in tasks
+        }
+        for future in as_completed(futures):
+            l, r = futures[future]
+            store(l, r, future.result())
+    return results
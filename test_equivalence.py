@@ -0,0 +1,194 @@
+# Python 3.10.6
+# =========================================================
+# Automated checks that every engine is still the Oslo model
+# =========================================================
+# run with `python -m pytest test_equivalence.py`, in well under a minute
+
+import random
+import numpy as np
+import pytest
+from scipy.stats import chi2_contingency, ks_2samp
+from model import Model
+from ensemble import EnsembleModel
+
+# p values below this fail a statistical comparison; with fixed seeds,
+# every run gives the same p values, so the tests never flicker
+SIGNIFICANCE = 0.001
+
+
+class ReferenceModel:
+    """
+    The Oslo model in its plainest form, sweeping every site until none
+    relaxes, independent of any engine, to compare engines against.
+    """
+
+    def __init__(self, length: int, p: float = 0.5, seed=None) -> None:
+        self.length = length
+        self.p = p
+        self.random = random.Random(seed)
+        self.gradients = [0] * length
+        self.thresholds = [self.new_threshold() for _ in range(length)]
+        self.is_transient = True
+
+    def new_threshold(self) -> int:
+        return 2 if self.random.random() < self.p else 1
+
+    def cycle(self) -> int:
+        self.gradients[0] += 1
+        relaxations = 0
+        unstable = True
+        while unstable:
+            unstable = False
+            for i in range(self.length):
+                if self.gradients[i] > self.thresholds[i]:
+                    unstable = True
+                    relaxations += 1
+                    if i == 0:
+                        self.gradients[0] -= 2
+                        self.gradients[1] += 1
+                    elif i == self.length - 1:
+                        self.gradients[i] -= 1
+                        self.gradients[i - 1] += 1
+                        self.is_transient = False
+                    else:
+                        self.gradients[i] -= 2
+                        self.gradients[i + 1] += 1
+                        self.gradients[i - 1] += 1
+                    self.thresholds[i] = self.new_threshold()
+        return relaxations
+
+    def get_pile_height(self) -> int:
+        return sum(self.gradients)
+
+    def get_gradients(self) -> list[int]:
+        return list(self.gradients)
+
+
+class EnsembleEngine:
+    """
+    A single replica of an `EnsembleModel`, with the interface of `Model`.
+    """
+
+    def __init__(self, length: int, p: float = 0.5, seed=None) -> None:
+        self.ensemble = EnsembleModel(length, 1, p, seed)
+
+    def cycle(self) -> int:
+        return int(self.ensemble.cycle_with_relax_count()[0])
+
+    def get_pile_height(self) -> int:
+        return int(self.ensemble.get_pile_heights()[0])
+
+    def get_gradients(self) -> list[int]:
+        return self.ensemble.get_gradients()[0].tolist()
+
+
+# every engine, as a function of (length, p, seed)
+engines = {
+    "model": lambda length, p, seed: Model(length, p, seed),
+    "checked": lambda length, p, seed: Model(length, p, seed, checked=True),
+    "ensemble": lambda length, p, seed: EnsembleEngine(length, p, seed),
+}
+
+
+def run(engine, num_cycles: int, thin: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (heights, sizes), the pile height and avalanche size after
+    every `thin`th of `num_cycles` cycles.
+    """
+    heights, sizes = [], []
+    for t in range(num_cycles):
+        size = engine.cycle()
+        if t % thin == 0:
+            heights.append(engine.get_pile_height())
+            sizes.append(size)
+    return (np.array(heights), np.array(sizes))
+
+
+# =========================================================
+# p = 0 golden traces
+# =========================================================
+
+
+@pytest.mark.parametrize("name", engines)
+def test_relax_counts(name):
+    # as in test_9
+    engine = engines[name](8, 0, None)
+    assert [engine.cycle() for _ in range(5)] == [0, 1, 0, 2, 1]
+
+
+@pytest.mark.parametrize("name", engines)
+def test_first_cycles(name):
+    # as in test_7
+    engine = engines[name](4, 0, None)
+    engine.cycle()
+    assert engine.get_gradients() == [1, 0, 0, 0]
+    assert engine.get_pile_height() == 1
+    engine.cycle()
+    assert engine.get_gradients() == [0, 1, 0, 0]
+    assert engine.get_pile_height() == 1
+
+
+def test_transition_counts():
+    # as in test_10
+    model = Model(8, p=0)
+    counts = [model.cycle_with_transition_counts() for _ in range(2)]
+    assert counts == [{1: {1: 0, 2: 0}, 2: {1: 0, 2: 0}},
+                      {1: {1: 1, 2: 0}, 2: {1: 0, 2: 0}}]
+
+
+@pytest.mark.parametrize("name", engines)
+def test_golden_trace(name):
+    # with p = 0 the model is deterministic, so every configuration
+    # must match the reference exactly, well into steady state
+    engine = engines[name](16, 0, None)
+    reference = ReferenceModel(16, 0)
+    for _ in range(600):
+        assert engine.cycle() == reference.cycle()
+        assert engine.get_gradients() == reference.get_gradients()
+        assert engine.get_pile_height() == reference.get_pile_height()
+
+
+# =========================================================
+# p = 0.5 statistics
+# =========================================================
+
+
+@pytest.mark.parametrize("name", engines)
+@pytest.mark.parametrize("length, expected", [(16, 26.5), (32, 53.9)])
+def test_mean_height(name, length, expected):
+    # the recommended tests from the lab manual, as in test_11 and test_12
+    engine = engines[name](length, 0.5, 1)
+    run(engine, length**2)
+    heights, _ = run(engine, 30000)
+    assert abs(np.mean(heights) - expected) < 0.1
+
+
+def chi_squared_p_value(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    The p value of a chi squared test that two samples of integers share
+    a distribution, with rare values pooled so every bin is well filled.
+    """
+    values = np.arange(min(a.min(), b.min()), max(a.max(), b.max()) + 1)
+    table = np.array([[np.sum(a == v) for v in values],
+                      [np.sum(b == v) for v in values]])
+    # pool the sparse tails into their neighbours
+    while table.shape[1] > 2 and table.sum(axis=0).min() < 10:
+        i = int(np.argmin(table.sum(axis=0)))
+        j = i + 1 if i == 0 else i - 1
+        table[:, j] += table[:, i]
+        table = np.delete(table, i, axis=1)
+    return chi2_contingency(table)[1]
+
+
+@pytest.mark.parametrize("name", engines)
+def test_distributions(name):
+    # samples far enough apart to be roughly independent, since tau ~ 7 at L = 16
+    length, thin, num_cycles = 16, 20, 40000
+    engine = engines[name](length, 0.5, 2)
+    reference = ReferenceModel(length, 0.5, 3)
+    run(engine, length**2)
+    run(reference, length**2)
+    heights, sizes = run(engine, num_cycles, thin)
+    reference_heights, reference_sizes = run(reference, num_cycles, thin)
+    assert chi_squared_p_value(heights, reference_heights) > SIGNIFICANCE
+    assert ks_2samp(sizes, reference_sizes).pvalue > SIGNIFICANCE
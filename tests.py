@@ -3,8 +3,22 @@
 # Tests for the model itself, for manual verification
 # =========================================================
 
-from model import Model
+from model import Model, spawn_seeds
+from ensemble import EnsembleModel
+from observers import RelaxCountObserver, OutflowObserver, ActivityObserver, AvalancheObserver
+from equilibration import equilibrate
+from time_series import integrated_autocorrelation_time
+from accumulators import HeightAccumulator, AvalancheHistogram
+from logbin import logbin, logbin_histogram
+from moments import moments, exact_moment
+from error_analysis import BlockingAccumulator
+from spatial_correlations import correlations
+from event_trace import record, replay
 import numpy as np
+import os
+import subprocess
+import sys
+import tempfile
 
 # =========================================================
 # plotting tests
@@ -312,3 +326,329 @@ def test_12():
         final_heights.append(test_model.get_pile_height())
     print("Expected: 53.9, measured: %.2f" % np.average(final_heights))
 # test_12()
+
+# =========================================================
+# ensemble tests
+# =========================================================
+
+
+def test_13():
+    """
+    Test that an ensemble of p=0 models matches a single p=0 model.
+    """
+    model = Model(8, p=0)
+    ensemble = EnsembleModel(8, 3, p=0)
+    counts = []
+    ensemble_counts = []
+    for _ in range(5):
+        counts.append(model.cycle_with_relax_count())
+        ensemble_counts.append(ensemble.cycle_with_relax_count().tolist())
+    print("Expected:", [[i] * 3 for i in counts])
+    print("Measured:", ensemble_counts)
+    print("Expected heights:", [model.get_pile_height()] * 3)
+    print("Measured heights:", ensemble.get_pile_heights().tolist())
+# test_13()
+
+
+def test_14():
+    """
+    Test the ensemble average pile height for L = 16, as in test_11.
+    """
+    ensemble = EnsembleModel(16, 20)
+    # get every replica to steady state
+    while np.any(ensemble.get_is_transient()):
+        ensemble.cycle()
+    final_heights = []
+    for _ in range(5000):
+        ensemble.cycle()
+        final_heights.append(np.average(ensemble.get_pile_heights()))
+    print("Expected: 26.5, measured: %.2f" % np.average(final_heights))
+# test_14()
+
+# =========================================================
+# checked mode tests
+# =========================================================
+
+
+def test_15():
+    """
+    Test that a checked model gives the same results as an unchecked model.
+    """
+    model = Model(32, seed=1)
+    unchecked_counts = [model.cycle_with_relax_count() for _ in range(5000)]
+    model = Model(32, seed=1, checked=True)
+    checked_counts = [model.cycle_with_relax_count() for _ in range(5000)]
+    print("Expected: True")
+    print("Measured:", unchecked_counts == checked_counts)
+# test_15()
+
+
+# =========================================================
+# random stream tests
+# =========================================================
+
+
+def test_16():
+    """
+    Test that seeded models can be replayed and spawned streams differ.
+    """
+    seeds = spawn_seeds(1, 2)
+    heights = []
+    for seed in [seeds[0], seeds[0], seeds[1]]:
+        model = Model(16, seed=seed)
+        for _ in range(10000):
+            model.cycle()
+        heights.append(model.get_all_heights())
+    print("Expected: True, False")
+    print("Measured:", heights[0] == heights[1], heights[0] == heights[2])
+# test_16()
+
+# =========================================================
+# observer tests
+# =========================================================
+
+
+def test_17():
+    """
+    Test that several observers can be collected in one pass, and agree
+    with cycle_with_relax_count for the same seed.
+    """
+    model = Model(32, seed=1)
+    counts = [model.cycle_with_relax_count() for _ in range(5000)]
+    model = Model(32, seed=1)
+    relax_count = RelaxCountObserver()
+    outflow = OutflowObserver()
+    activity = ActivityObserver(32)
+    observed_counts = []
+    total_outflow = 0
+    for _ in range(5000):
+        model.cycle((relax_count, outflow, activity))
+        observed_counts.append(relax_count.count)
+        total_outflow += outflow.outflow
+    print("Expected: True, True")
+    print("Measured:", counts == observed_counts,
+          sum(counts) == sum(activity.activity))
+    print("Expected outflow: %i" % activity.activity[-1])
+    print("Measured outflow: %i" % total_outflow)
+# test_17()
+
+# =========================================================
+# equilibration tests
+# =========================================================
+
+
+def test_18():
+    """
+    Test that equilibration stops around the cross-over time of ~0.85 L^2,
+    at the steady state pile height of ~1.7 L, and that the autocorrelation
+    time of an AR(1) series x_t = 0.9 x_t-1 + noise is (1 + 0.9) / (1 - 0.9).
+    """
+    model = Model(64, seed=1)
+    cycles = equilibrate(model)
+    print("Expected: ~3500 cycles, height ~108")
+    print("Measured: %i cycles, height %i" % (cycles, model.get_pile_height()))
+    rng = np.random.default_rng(1)
+    series = np.zeros(100000)
+    for t in range(1, len(series)):
+        series[t] = 0.9 * series[t - 1] + rng.normal()
+    print("Expected: ~19")
+    print("Measured:", integrated_autocorrelation_time(series))
+# test_18()
+
+# =========================================================
+# accumulator tests
+# =========================================================
+
+
+def test_19():
+    """
+    Test that height accumulators, filled one height at a time and merged,
+    agree with numpy on the whole height sequence.
+    """
+    model = Model(16, seed=1)
+    for _ in range(16**2):
+        model.cycle()
+    heights = []
+    accumulators = [HeightAccumulator(), HeightAccumulator()]
+    for j in range(100000):
+        model.cycle()
+        heights.append(model.get_pile_height())
+        accumulators[j % 2].add(model.get_pile_height())
+    accumulators[0].merge(accumulators[1])
+    print("Expected:", np.mean(heights), np.std(heights), np.bincount(heights).tolist())
+    print("Measured:", accumulators[0].get_mean(), accumulators[0].get_std(),
+          accumulators[0].get_histogram()[:max(heights) + 1].tolist())
+# test_19()
+
+
+def test_20():
+    """
+    Test that avalanche histograms, filled one avalanche at a time and merged,
+    give the same moments and log binned distribution as the raw sizes.
+    """
+    model = Model(32, seed=1)
+    for _ in range(32**2):
+        model.cycle()
+    sizes = []
+    histograms = [AvalancheHistogram(), AvalancheHistogram()]
+    for j in range(100000):
+        sizes.append(model.cycle())
+        histograms[j % 2].add(sizes[-1])
+    histograms[0].merge(histograms[1])
+    x, y = logbin(sizes, scale=1.2)
+    x_histogram, y_histogram = logbin_histogram(histograms[0].get_histogram(), scale=1.2)
+    print("Expected:", [sum(s**k for s in sizes) / len(sizes) for k in [1, 4]], True)
+    print("Measured:", [histograms[0].get_moment(k) for k in [1, 4]],
+          bool(np.all(x == x_histogram) and np.all(y == y_histogram)))
+# test_20()
+
+
+def test_21():
+    """
+    Test that moments calculated in log space agree with the exact moments,
+    up to the 10th, where s^k is far beyond int64.
+    """
+    model = Model(64, seed=1)
+    for _ in range(64**2):
+        model.cycle()
+    histogram = AvalancheHistogram()
+    for _ in range(100000):
+        histogram.add(model.cycle())
+    orders = list(range(1, 11))
+    values, errors = moments(histogram.get_histogram(), orders)
+    print("Expected:", [float(exact_moment(histogram.get_histogram(), k)) for k in orders])
+    print("Measured:", values.tolist())
+    print("Relative errors:", (errors / values).tolist())
+# test_21()
+
+
+# =========================================================
+# error analysis tests
+# =========================================================
+
+
+def test_22():
+    """
+    Test that blocking, fed a chunk at a time, recovers the error on the mean
+    of an AR(1) series x_t = 0.9 x_t-1 + noise, which is sqrt(19) times
+    larger than std / sqrt(n), since tau = (1 + 0.9) / (1 - 0.9) = 19.
+    """
+    rng = np.random.default_rng(1)
+    series = np.zeros(2**20)
+    noise = rng.normal(size=len(series))
+    for t in range(1, len(series)):
+        series[t] = 0.9 * series[t - 1] + noise[t]
+    blocking = BlockingAccumulator()
+    for start in range(0, len(series), 10000):
+        blocking.add_array(series[start:start + 10000])
+    print("Expected: ~%.5f" % (np.std(series) * np.sqrt(19 / len(series))))
+    print("Measured: %.5f" % blocking.get_error())
+# test_22()
+
+
+# =========================================================
+# spatial correlation tests
+# =========================================================
+
+
+def test_23():
+    """
+    Test that the correlations between gradients at every separation, for
+    several snapshots at once, agree with np.corrcoef one at a time.
+    """
+    model = Model(64, seed=1)
+    snapshots = []
+    for _ in range(5):
+        for _ in range(64**2):
+            model.cycle()
+        snapshots.append(model.get_gradients())
+    expected = [[np.corrcoef(g[s:], g[:-s])[0][1] for s in range(1, 11)]
+                for g in snapshots]
+    print("Expected:", np.round(expected, 6).tolist())
+    print("Measured:", np.round(correlations(snapshots, 10), 6).tolist())
+# test_23()
+
+
+# =========================================================
+# import time tests
+# =========================================================
+# seconds the simulation core may take to import from cold, which every
+# sweep worker pays, measured at ~0.15s with numpy alone
+IMPORT_BUDGET = 0.3
+
+
+def test_24():
+    """
+    Test that the simulation core imports within budget in a fresh process,
+    without loading matplotlib or scipy.
+    """
+    code = ("import sys, time; start = time.perf_counter(); "
+            "import model, sweep, steady_states, generate_heights, generate_avalanches; "
+            "print(time.perf_counter() - start, "
+            "'matplotlib' in sys.modules or 'scipy' in sys.modules)")
+    seconds, heavy = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                                    text=True).stdout.split()
+    print("Expected: < %.2fs, False" % IMPORT_BUDGET)
+    print("Measured: %.2fs, %s" % (float(seconds), heavy))
+    assert float(seconds) < IMPORT_BUDGET and heavy == "False"
+# test_24()
+
+
+# =========================================================
+# event trace tests
+# =========================================================
+
+
+def test_25():
+    """
+    Test that replaying a recorded trace rebuilds the model exactly as it
+    was after a given cycle, including between keyframes.
+    """
+    model = Model(64, seed=1)
+    state = model.get_state()
+    expected = Model.from_state(state)
+    for _ in range(3456):
+        expected.cycle()
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "test_trace.bin")
+        record(model, path, 5000, keyframe_interval=1000)
+        measured = replay(path, 3456)
+    print("Expected:", expected.get_gradients(), expected.get_thresholds())
+    print("Measured:", measured.get_gradients(), measured.get_thresholds())
+# test_25()
+
+
+# =========================================================
+# avalanche observable tests
+# =========================================================
+
+
+def test_26():
+    """
+    Test that avalanche durations match the number of steps of a parallel
+    update, relaxing every supercritical site at once, for p=0 where the
+    order of relaxations makes no difference, and that drops match outflow.
+    """
+    model = Model(16, p=0)
+    observer = AvalancheObserver(16)
+    outflow = OutflowObserver()
+    durations, drops = [], []
+    for _ in range(1000):
+        gradients = model.get_gradients()
+        gradients[0] += 1
+        steps = 0
+        while max(gradients) > 1:
+            steps += 1
+            for i in [i for i in range(16) if gradients[i] > 1]:
+                gradients[i] -= 1 if i == 15 else 2
+                if i > 0:
+                    gradients[i-1] += 1
+                if i < 15:
+                    gradients[i+1] += 1
+        durations.append(steps)
+        model.cycle((observer, outflow))
+        drops.append(outflow.outflow)
+    print("Expected:", sum(durations), max(durations), sum(drops))
+    print("Measured:", sum(observer.durations), max(observer.durations),
+          sum(observer.drops))
+# test_26()
@@ -0,0 +1,117 @@
+# Python 3.10.6
+# =========================================================
+# Autocorrelation and power spectra of long time series
+# =========================================================
+
+import numpy as np
+
+# number of values read at a time from a series
+CHUNK_SIZE = 2**20
+
+
+def series_mean(series, chunk_size: int = CHUNK_SIZE) -> float:
+    """
+    The mean of `series`, read a chunk at a time, so it can be memory mapped.
+    """
+    total = 0.0
+    for start in range(0, len(series), chunk_size):
+        total += float(np.sum(np.asarray(series[start:start + chunk_size], dtype=float)))
+    return total / len(series)
+
+
+def fft_size(n: int) -> int:
+    """
+    The smallest power of 2 of at least `n`, which the FFT is fastest for.
+    """
+    return 2 ** int(np.ceil(np.log2(max(n, 1))))
+
+
+def autocorrelation(series, max_lag: int | None = None,
+                    chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    The normalised autocorrelation function of `series`, for every lag from
+    0 to `max_lag`, default len(series) - 1 or `chunk_size` if smaller,
+    calculated by FFT in O(n log n).
+    Longer series are read a chunk at a time, so they can be memory mapped,
+    with each chunk correlated against itself and the `max_lag` values which
+    follow it, so the sums are the same as for the whole series at once.
+    """
+    n = len(series)
+    if max_lag is None:
+        max_lag = min(n - 1, chunk_size)
+    max_lag = min(max_lag, n - 1)
+    mean = series_mean(series, chunk_size)
+    chunk_size = max(chunk_size, max_lag)
+    # zero padding avoids circular correlation
+    size = fft_size(2 * chunk_size + max_lag)
+    acf = np.zeros(max_lag + 1)
+    for start in range(0, n, chunk_size):
+        a = np.asarray(series[start:start + chunk_size], dtype=float) - mean
+        b = np.asarray(series[start:start + chunk_size + max_lag], dtype=float) - mean
+        # sum over i of a[i] * b[i + k], for each lag k
+        correlation = np.fft.irfft(np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size), size)
+        acf += correlation[:max_lag + 1]
+    if acf[0] == 0:
+        # a constant series is uncorrelated with itself
+        acf = np.zeros(max_lag + 1)
+        acf[0] = 1
+        return acf
+    return acf / acf[0]
+
+
+def integrated_autocorrelation_time(series, c: float = 5.0, max_lag: int | None = None,
+                                    chunk_size: int = CHUNK_SIZE) -> float:
+    """
+    The integrated autocorrelation time of `series`, tau = 1 + 2 sum(rho(t)),
+    so that `series` is worth len(series) / tau independent samples.
+    The sum is cut off at the first lag M >= c * tau(M), as suggested by Sokal.
+    """
+    return autocorrelation_time(autocorrelation(series, max_lag, chunk_size), c)
+
+
+def autocorrelation_time(rho: np.ndarray, c: float = 5.0) -> float:
+    """
+    The integrated autocorrelation time from an already calculated
+    autocorrelation function `rho`, as for `integrated_autocorrelation_time`.
+    """
+    taus = 1 + 2 * np.cumsum(rho[1:])
+    lags = np.arange(1, len(rho))
+    cut_off = np.nonzero(lags >= c * taus)[0]
+    if len(cut_off) == 0:
+        # the series is too short, or max_lag too small, to estimate tau reliably
+        return float(taus[-1])
+    return float(taus[cut_off[0]])
+
+
+def power_spectrum(series, segment_length: int = 4096,
+                   chunk_size: int = CHUNK_SIZE) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (frequencies, power), the one sided power spectral density of
+    `series` by Welch's method, in cycles per cycle, as from
+    `scipy.signal.welch` with its defaults: Hann windowed segments of
+    `segment_length`, overlapping by half, each with its mean removed.
+    Segments are read and transformed a batch at a time, so the series
+    can be memory mapped.
+    """
+    n = len(series)
+    segment_length = min(segment_length, n)
+    step = segment_length - segment_length // 2
+    window = np.hanning(segment_length + 1)[:-1]
+    scale = 1 / np.sum(window**2)
+    starts = range(0, n - segment_length + 1, step)
+    # whole segments per batch, in a single strided view
+    per_batch = max(1, chunk_size // step)
+    power = np.zeros(segment_length // 2 + 1)
+    for first in range(0, len(starts), per_batch):
+        batch = starts[first:first + per_batch]
+        values = np.asarray(series[batch[0]:batch[-1] + segment_length], dtype=float)
+        segments = np.lib.stride_tricks.sliding_window_view(values, segment_length)[::step]
+        segments = segments - np.mean(segments, axis=1, keepdims=True)
+        power += np.sum(np.abs(np.fft.rfft(segments * window, axis=1))**2, axis=0)
+    power *= scale / len(starts)
+    # one sided, so double all but the zero and Nyquist frequencies
+    if segment_length % 2 == 0:
+        power[1:-1] *= 2
+    else:
+        power[1:] *= 2
+    return (np.fft.rfftfreq(segment_length), power)
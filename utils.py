@@ -3,8 +3,6 @@
 # Useful functions and constants
 # =========================================================
 
-import numpy as np
-
 # folder locations
 data_folder = './data/'
 figures_folder = './figures/'
@@ -15,6 +13,8 @@ def average_different_lengths(a: list[list[int]]) -> list[int]:
     A function to average lists of different lengths.
     All lists are truncated to the shortest length.
     """
+    # imported here, so the folder locations can be used without numpy
+    import numpy as np
     list_lengths = [len(i) for i in a]
     min_length = min(list_lengths)
     for l in a: